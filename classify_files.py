@@ -1,9 +1,26 @@
+import errno
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 支持的图片和视频扩展名
-IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
-VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.mpeg'}
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'})
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.mpeg'})
+
+# 并发移动文件的线程数
+MOVE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+def move_file(src_path, dest_path):
+    """
+    移动文件：同一文件系统内直接os.rename（单次系统调用），
+    跨文件系统（EXDEV）时回退到shutil.move
+    """
+    try:
+        os.rename(src_path, dest_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src_path, dest_path)
 
 def classify_files(directory):
     """
@@ -11,6 +28,8 @@ def classify_files(directory):
     - 图片移动到image目录
     - 视频移动到video目录
     - 其他文件保留在根目录
+    先收集需要移动的文件，再用线程池并发移动，每个文件移动完成后立即输出结果；
+    单个文件移动失败时输出错误并继续移动其他文件
     """
     # 创建目标目录
     image_dir = os.path.join(directory, 'image')
@@ -18,12 +37,22 @@ def classify_files(directory):
     os.makedirs(image_dir, exist_ok=True)
     os.makedirs(video_dir, exist_ok=True)
     
+    # 扩展名 -> (目标目录, 目录名, 类型名)，每个文件只需一次查表
+    ext_map = {ext: (image_dir, 'image', '图片') for ext in IMAGE_EXTENSIONS}
+    ext_map.update({ext: (video_dir, 'video', '视频') for ext in VIDEO_EXTENSIONS})
+
+    moves = []
+
     # 遍历目录中的文件
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
+    with os.scandir(directory) as entries:
+        dir_entries = list(entries)
+
+    for entry in dir_entries:
+        filename = entry.name
+        filepath = entry.path
         
         # 跳过目录
-        if os.path.isdir(filepath):
+        if entry.is_dir():
             continue
             
         # 获取文件扩展名
@@ -31,19 +60,26 @@ def classify_files(directory):
         ext = ext.lower()
         
         # 分类文件
-        if ext in IMAGE_EXTENSIONS:
-            dest = os.path.join(image_dir, filename)
-            shutil.move(filepath, dest)
-            print(f"移动图片: {filename} -> image/")
-            
-        elif ext in VIDEO_EXTENSIONS:
-            dest = os.path.join(video_dir, filename)
-            shutil.move(filepath, dest)
-            print(f"移动视频: {filename} -> video/")
+        target = ext_map.get(ext)
+        if target:
+            target_dir, dir_name, kind = target
+            moves.append((filepath, os.path.join(target_dir, filename), f"移动{kind}: {filename} -> {dir_name}/"))
             
         else:
             print(f"保留文件: {filename}")
 
+    # 移动以文件系统元数据操作为主，线程池可以让多个请求同时进行（网络文件系统上尤其明显）
+    with ThreadPoolExecutor(max_workers=MOVE_WORKERS) as executor:
+        futures = {executor.submit(move_file, src, dest): (src, message) for src, dest, message in moves}
+        for future in as_completed(futures):
+            src, message = futures[future]
+            try:
+                future.result()
+            except OSError as e:
+                print(f"移动失败: {os.path.basename(src)} ({e})")
+            else:
+                print(message)
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='分类文件到image和video目录')
@@ -0,0 +1,108 @@
+# 直接解析文件头中的EXIF结构读取拍摄时间，organize_photos与other目录下的脚本共用
+import os
+import struct
+from datetime import datetime
+
+# EXIF标签ID: Exif子IFD指针、DateTimeOriginal（拍摄时间）
+EXIF_IFD_POINTER = 0x8769
+DATETIME_ORIGINAL = 0x9003
+
+# EXIF时间格式
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# 直接解析TIFF结构时读取的文件头大小，IFD0和Exif子IFD通常都在这个范围内
+TIFF_HEADER_SIZE = 64 * 1024
+
+
+def find_ifd_entry(tiff, endian, ifd_offset, tag):
+    """在TIFF数据的IFD中查找指定标签，返回(类型, 数量, 值/偏移字段)或None"""
+    (entry_count,) = struct.unpack_from(endian + 'H', tiff, ifd_offset)
+    for i in range(entry_count):
+        entry_tag, entry_type, count = struct.unpack_from(endian + 'HHI', tiff, ifd_offset + 2 + i * 12)
+        if entry_tag == tag:
+            return entry_type, count, ifd_offset + 10 + i * 12
+    return None
+
+
+def parse_exif_datetime(tiff):
+    """从APP1段中的TIFF数据读取DateTimeOriginal字符串"""
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        raise ValueError("无效的TIFF字节序")
+
+    (ifd0_offset,) = struct.unpack_from(endian + 'I', tiff, 4)
+    pointer = find_ifd_entry(tiff, endian, ifd0_offset, EXIF_IFD_POINTER)
+    if not pointer:
+        return None
+    (exif_ifd_offset,) = struct.unpack_from(endian + 'I', tiff, pointer[2])
+
+    entry = find_ifd_entry(tiff, endian, exif_ifd_offset, DATETIME_ORIGINAL)
+    if not entry:
+        return None
+    _, count, value_pos = entry
+    if count > 4:
+        (value_pos,) = struct.unpack_from(endian + 'I', tiff, value_pos)
+    if value_pos + count > len(tiff):
+        raise ValueError("DateTimeOriginal超出EXIF数据范围")
+    return tiff[value_pos:value_pos + count].rstrip(b'\x00').decode('ascii', errors='replace')
+
+
+def read_jpeg_exif_datetime(image_path):
+    """
+    直接解析JPEG的APP1(Exif)段读取拍摄时间，只读取图像数据之前的文件头，不经过Pillow
+    返回: DateTimeOriginal原始字符串，文件没有该标签时返回None
+    异常: 文件结构无法解析时抛出ValueError/struct.error
+    """
+    with open(image_path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            raise ValueError("不是JPEG文件")
+        while True:
+            header = f.read(4)
+            if len(header) < 4 or header[0] != 0xFF:
+                raise ValueError("无效的JPEG段")
+            marker = header[1]
+            (length,) = struct.unpack('>H', header[2:])
+            if marker == 0xE1:
+                data = f.read(length - 2)
+                if data.startswith(b'Exif\x00\x00'):
+                    return parse_exif_datetime(data[6:])
+            elif marker in (0xDA, 0xD9):
+                # 已到图像数据，文件中没有EXIF
+                return None
+            else:
+                f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_tiff_exif_datetime(image_path):
+    """
+    直接解析TIFF结构文件（CR2/NEF等）开头的IFD读取拍摄时间，只读取TIFF_HEADER_SIZE字节
+    返回: DateTimeOriginal原始字符串，文件没有该标签时返回None
+    异常: 文件结构无法解析或标签不在文件头范围内时抛出ValueError/struct.error
+    """
+    with open(image_path, 'rb') as f:
+        tiff = f.read(TIFF_HEADER_SIZE)
+    if tiff[:4] not in (b'II*\x00', b'MM\x00*'):
+        raise ValueError("不是TIFF结构的文件")
+    return parse_exif_datetime(tiff)
+
+
+def parse_exif_datetime_string(dt_str):
+    """
+    解析EXIF日期时间字符串 "YYYY:MM:DD HH:MM:SS"
+    标准格式直接按位置切片，避免strptime每次解析格式串；格式不标准时回退到strptime
+    参数:
+        dt_str (str): EXIF日期时间字符串
+    返回:
+        datetime: 解析结果，无法解析时抛出ValueError
+    """
+    if (len(dt_str) == 19 and dt_str[4] == ':' and dt_str[7] == ':' and dt_str[10] == ' '
+            and dt_str[13] == ':' and dt_str[16] == ':'):
+        try:
+            return datetime(int(dt_str[0:4]), int(dt_str[5:7]), int(dt_str[8:10]),
+                            int(dt_str[11:13]), int(dt_str[14:16]), int(dt_str[17:19]))
+        except ValueError:
+            pass
+    return datetime.strptime(dt_str, EXIF_DATETIME_FORMAT)
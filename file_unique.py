@@ -1,37 +1,243 @@
 # 遍历删除文件夹里面的重复文件
 import os
+import filecmp
 import hashlib
+import mmap
+import sqlite3
 import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def calculate_md5(filepath):
-    """计算文件的MD5哈希值（支持大文件）"""
-    hash_md5 = hashlib.md5()
+# 文件数达到该值时才启用多进程计算哈希，避免小目录承担进程启动开销
+PARALLEL_THRESHOLD = 16
+
+# 分块读取文件时的块大小
+CHUNK_SIZE = 1024 * 1024
+# 达到该大小的文件整体映射到内存，一次性计算哈希
+MMAP_THRESHOLD = 10 * 1024 * 1024
+# 大小相同的文件先比较头部的字节数，头部不同即可排除，无需读取整个文件
+HEAD_SIZE = 64 * 1024
+
+# 持久化哈希缓存的默认位置（与organize_photos共用）
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.photo_organizer', 'cache.sqlite')
+
+def hash_file(filepath, hasher):
+    """用文件内容更新哈希对象并返回十六进制哈希值（支持大文件）"""
+    with open(filepath, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                hasher.update(mm)
+        else:
+            # 复用同一块缓冲区循环readinto，不为每个块分配新的bytes对象
+            buf = bytearray(min(size, CHUNK_SIZE))
+            view = memoryview(buf)
+            while n := f.readinto(buf):
+                hasher.update(view[:n])
+    return hasher.hexdigest()
+
+def calculate_digest(filepath):
+    """
+    计算用于去重的文件哈希值（SHA-1，支持大文件）
+    去重只需判断内容是否相同；SHA-1在带SHA指令扩展的CPU上比MD5快2倍以上，其他CPU上也不慢于MD5
+    """
+    try:
+        return hash_file(filepath, hashlib.sha1())
+    except (IOError, PermissionError):
+        return None
+
+def calculate_head_digest(filepath):
+    """计算文件头部HEAD_SIZE字节的哈希值，用于快速排除内容不同的文件"""
     try:
         with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            return hashlib.sha1(f.read(HEAD_SIZE)).hexdigest()
     except (IOError, PermissionError):
         return None
 
-def find_duplicate_files(directory):
-    """查找并分组重复文件"""
-    md5_groups = defaultdict(list)
-    
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
-        if os.path.isfile(filepath):
-            md5 = calculate_md5(filepath)
-            if md5:
-                md5_groups[md5].append(filepath)
+def hash_files(filepaths, max_workers=None):
+    """
+    计算多个文件的哈希值，文件较多时分发到多个进程并行计算
+    返回:
+        list: [(文件路径, 哈希值)] 列表，顺序与输入一致
+    """
+    if len(filepaths) < PARALLEL_THRESHOLD or max_workers == 1:
+        return [(filepath, calculate_digest(filepath)) for filepath in filepaths]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(zip(filepaths, executor.map(calculate_digest, filepaths, chunksize=16)))
+
+class MetadataCache:
+    """
+    持久化的文件元数据缓存（SQLite），跨多次运行复用文件哈希值和拍摄时间
+    以(绝对路径, 大小, 修改时间)为键，文件内容变化后旧记录自动失效
+    file_unique和organize_photos共用这个缓存，两个工具计算过的哈希值可以互相复用
+    """
+
+    COLUMNS = ('digest', 'exif')
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, batch_size=500):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            "path TEXT, size INTEGER, mtime INTEGER, digest TEXT, exif TEXT, "
+            "PRIMARY KEY (path, size, mtime))"
+        )
+        self.batch_size = batch_size
+        self.pending = 0
+
+    def key(self, path, st=None):
+        st = st or os.stat(path)
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    def get(self, path, column, st=None):
+        """读取缓存值，未缓存时返回None"""
+        assert column in self.COLUMNS
+        row = self.conn.execute(
+            f"SELECT {column} FROM meta WHERE path = ? AND size = ? AND mtime = ?",
+            self.key(path, st)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, path, column, value, st=None):
+        """写入缓存值，每batch_size条提交一次"""
+        assert column in self.COLUMNS
+        key = self.key(path, st)
+        # 同一路径的旧版本记录已失效
+        self.conn.execute("DELETE FROM meta WHERE path = ? AND (size != ? OR mtime != ?)", key)
+        self.conn.execute("INSERT OR IGNORE INTO meta (path, size, mtime) VALUES (?, ?, ?)", key)
+        self.conn.execute(
+            f"UPDATE meta SET {column} = ? WHERE path = ? AND size = ? AND mtime = ?",
+            (value,) + key
+        )
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+def hash_files_cached(filepaths, max_workers=None, cache=None):
+    """
+    计算多个文件的完整哈希值，提供缓存时只计算未缓存或已变化的文件
+    返回:
+        list: [(文件路径, 哈希值)] 列表
+    """
+    if cache is None:
+        return hash_files(filepaths, max_workers)
+
+    results = []
+    stats = {}
+    missing = []
+    for filepath in filepaths:
+        try:
+            stats[filepath] = os.stat(filepath)
+        except OSError:
+            results.append((filepath, None))
+            continue
+        digest = cache.get(filepath, 'digest', stats[filepath])
+        if digest:
+            results.append((filepath, digest))
+        else:
+            missing.append(filepath)
+
+    for filepath, digest in hash_files(missing, max_workers):
+        if digest:
+            cache.set(filepath, 'digest', digest, stats[filepath])
+        results.append((filepath, digest))
+    cache.commit()
+    return results
+
+def compare_files(path_a, path_b):
+    """逐字节比较两个文件的内容是否相同，无法读取时视为不同"""
+    try:
+        return filecmp.cmp(path_a, path_b, shallow=False)
+    except OSError:
+        return False
+
+def find_duplicate_files(directory, max_workers=None, cache=None):
+    """
+    查找并分组重复文件
+    先按文件大小分组，再比较文件头部，只有大小和头部都相同的文件才需要进一步比较：
+    候选文件只有两个时直接逐字节比较，三个及以上时计算完整哈希值
+    参数:
+        directory (str): 要扫描的目录
+        max_workers (int): 同时计算完整哈希的最大进程数（头部哈希为线程数），默认CPU核数；机械硬盘上设为1避免随机读
+        cache (MetadataCache): 持久化哈希缓存，为None时不使用缓存；启用缓存时两个候选文件也计算哈希，留给下次运行复用
+    返回:
+        list: 重复文件分组列表，每组是内容相同的文件路径列表
+    """
+    size_groups = defaultdict(list)
+    inodes = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # 不跟随符号链接：链接与其指向的文件内容相同，按重复文件处理可能删掉真正的文件而只留下链接
+            if entry.is_file(follow_symlinks=False):
+                size_groups[entry.stat(follow_symlinks=False).st_size].append(entry.path)
+                inodes[entry.path] = entry.inode()
+
+    # 大小相同的大文件先比较头部HEAD_SIZE字节，头部不同的文件无需再读取整个文件
+    candidate_groups = []
+    head_candidates = []
+    for size, paths in size_groups.items():
+        if len(paths) < 2:
+            continue
+        if size <= HEAD_SIZE:
+            candidate_groups.append(paths)
+        else:
+            head_candidates.extend((path, size) for path in paths)
+
+    # 按inode顺序读取文件：文件数据在磁盘上的位置大致与inode顺序一致，可减少机械硬盘寻道
+    head_candidates.sort(key=lambda item: inodes[item[0]])
+    head_paths = [path for path, _ in head_candidates]
+    head_groups = defaultdict(list)
+    # 头部只有HEAD_SIZE字节，开销主要在打开和读取文件上，用线程池并行即可，
+    # 不必像完整哈希那样承担进程启动和跨进程传递路径、结果的开销
+    if len(head_paths) < PARALLEL_THRESHOLD or max_workers == 1:
+        heads = map(calculate_head_digest, head_paths)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            heads = list(executor.map(calculate_head_digest, head_paths))
+    for (filepath, size), head in zip(head_candidates, heads):
+        if head:
+            head_groups[(size, head)].append(filepath)
+    candidate_groups.extend(paths for paths in head_groups.values() if len(paths) > 1)
+
+    # 只有两个候选文件时直接逐字节比较，内容不同时在第一个不同的块就结束，无需计算哈希
+    duplicates = []
+    filepaths = []
+    for paths in candidate_groups:
+        if cache is None and len(paths) == 2:
+            if compare_files(*paths):
+                duplicates.append(paths)
+        else:
+            filepaths.extend(paths)
+    filecmp.clear_cache()
+    filepaths.sort(key=inodes.get)
+
+    digest_groups = defaultdict(list)
+    for filepath, digest in hash_files_cached(filepaths, max_workers, cache):
+        if digest:
+            digest_groups[digest].append(filepath)
     
-    return {k: v for k, v in md5_groups.items() if len(v) > 1}
+    duplicates.extend(paths for paths in digest_groups.values() if len(paths) > 1)
+    return duplicates
 
 def delete_duplicates(duplicates, simulate=False):
-    """删除重复文件（保留每组第一个文件）"""
+    """
+    删除重复文件（保留每组按路径排序后的第一个文件）
+    参数:
+        duplicates (list): find_duplicate_files返回的重复文件分组列表
+    """
     deletion_log = []
-    for md5, file_list in duplicates.items():
+    for file_list in duplicates:
         # 按文件名排序确保一致性
         sorted_files = sorted(file_list)
         keeper = sorted_files[0]
@@ -49,13 +255,13 @@ def delete_duplicates(duplicates, simulate=False):
     return deletion_log
   
 
-def do_file_unique(source_dir, simulate=False):
+def do_file_unique(source_dir, simulate=False, max_workers=None, cache=None):
     if not os.path.isdir(source_dir):
         print("错误: 目录不存在")
         return
 
     print(f"扫描目录: {source_dir}")
-    duplicates = find_duplicate_files(source_dir)
+    duplicates = find_duplicate_files(source_dir, max_workers, cache)
     
     if not duplicates:
         print("✅ 未发现重复文件")
@@ -63,8 +269,8 @@ def do_file_unique(source_dir, simulate=False):
 
     # 打印重复文件分组
     print("\n发现重复文件组:")
-    for i, (md5, files) in enumerate(duplicates.items(), 1):
-        print(f"\n组 #{i} (MD5: {md5}):")
+    for i, files in enumerate(duplicates, 1):
+        print(f"\n组 #{i} ({len(files)} 个相同文件):")
         for f in sorted(files):
             print(f"  - {os.path.basename(f)}")
 
@@ -79,12 +285,31 @@ def do_file_unique(source_dir, simulate=False):
     print(f"\n总计: 发现 {len(duplicates)} 组重复文件，已处理 {len(log)} 个重复项")
 
 
+def positive_int(value):
+    """命令行参数类型：不小于1的整数，0或负数在解析参数时直接报错，不会传给进程池"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须是不小于1的整数: {value}")
+    return number
+
+
 def main():
     parser = argparse.ArgumentParser(description="查找并删除重复文件")
     parser.add_argument("directory", help="要扫描的目录路径")
     parser.add_argument("--simulate", action="store_true", help="模拟运行（不实际删除）")
+    parser.add_argument("--max-concurrency", type=positive_int, default=None,
+                        help="同时计算哈希的最大进程数（默认CPU核数，机械硬盘建议设为1）")
+    parser.add_argument("--cache", action="store_true",
+                        help=f"缓存文件哈希值，重复运行时跳过未变化的文件 ({DEFAULT_CACHE_PATH})")
     args = parser.parse_args()
-    do_file_unique(args.directory, simulate=args.simulate)
+
+    cache = MetadataCache() if args.cache else None
+    try:
+        do_file_unique(args.directory, simulate=args.simulate,
+                       max_workers=args.max_concurrency, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
 
 if __name__ == "__main__":
     main()
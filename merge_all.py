@@ -1,22 +1,135 @@
 # 把文件夹下面所有的文件拷贝到一个新目录，并解决文件命名冲突
 # 已验证OK
 
+import errno
 import os
 import shutil
+import sys
 import logging
+import logging.handlers
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux ioctl: 写时复制克隆整个文件 (Btrfs/XFS 等)
+FICLONE = 0x40049409
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('merge_all.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# 复制时忽略的系统文件
+IGNORED_FILES = frozenset({'.DS_Store'})
+
+# 每复制多少个文件输出一次进度
+PROGRESS_INTERVAL = 1000
+
+# 并发复制文件的线程数
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+class ConflictResolver:
+    """
+    为目标目录分配不冲突的文件名
+    目录只读取一次，之后在内存中维护已占用的文件名
+    按小写比较，兼容大小写不敏感的文件系统(macOS/Windows)
+    """
+
+    def __init__(self, directory):
+        self.names = {name.lower() for name in os.listdir(directory)}
+        # 小写文件名 -> 下次从哪个冲突级别开始尝试
+        # 已占用的文件名不会释放，低于该级别的名称都已被占用，大量同名文件时无需每次从_1重新尝试
+        self.next_levels = {}
+
+    def resolve(self, filename):
+        """返回(可用的文件名, 冲突级别)，并把该文件名标记为已占用"""
+        base_name, ext = os.path.splitext(filename)
+        key = filename.lower()
+        conflict_level = self.next_levels.get(key, 0)
+        new_name = f"{base_name}_{conflict_level}{ext}" if conflict_level else filename
+        while new_name.lower() in self.names:
+            conflict_level += 1
+            new_name = f"{base_name}_{conflict_level}{ext}"
+        self.names.add(new_name.lower())
+        self.next_levels[key] = conflict_level + 1
+        return new_name, conflict_level
+
+
+def fast_copy(src_path, dest_path):
+    """
+    复制文件内容和元数据（同shutil.copy2）
+    支持copy_file_range时在内核中完成复制，数据不经过用户态缓冲区
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src_path, 'rb') as src, open(dest_path, 'wb') as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(src_path, dest_path)
+                return
+        except OSError as e:
+            # 跨文件系统或文件系统不支持时回退到普通复制
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+
+    shutil.copy2(src_path, dest_path)
+
+
+def clone_file(src_path, dest_path):
+    """
+    尝试用FICLONE写时复制克隆文件（仅Linux，需Btrfs/XFS等文件系统支持），克隆不复制数据，瞬间完成
+    返回:
+        bool: 克隆成功返回True，平台或文件系统不支持时返回False
+    """
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        with open(src_path, 'rb') as src, open(dest_path, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOTTY):
+            raise
+        return False
+    shutil.copystat(src_path, dest_path)
+    return True
+
+
+def copy_file(src_path, dest_path):
+    """复制单个文件：优先写时复制克隆，不支持时在内核中复制（fast_copy）"""
+    if not clone_file(src_path, dest_path):
+        fast_copy(src_path, dest_path)
+
+
+def walk_files(directory, exclude_dir=None):
+    """
+    递归遍历目录，逐个返回文件的DirEntry（先返回当前目录的文件，再进入子目录，与os.walk顺序一致）
+    直接使用scandir已经读到的文件类型信息，不需要为每个文件额外stat
+    不进入指向目录的符号链接；指向文件的符号链接按其指向的文件返回，复制的是文件内容（与os.walk加shutil.copy2一致），
+    只有这类链接判断类型时需要一次stat
+    参数:
+        directory (str): 要遍历的目录
+        exclude_dir (str): 不进入的目录（绝对路径）
+    返回:
+        generator: 文件的os.DirEntry
+    """
+    subdirs = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if os.path.abspath(entry.path) != exclude_dir:
+                    subdirs.append(entry.path)
+            elif entry.is_file():
+                yield entry
+    for subdir in subdirs:
+        yield from walk_files(subdir, exclude_dir)
+
 
 def copy_files_with_conflict_resolution(src_dir, dest_dir):
     """
@@ -33,43 +146,47 @@ def copy_files_with_conflict_resolution(src_dir, dest_dir):
     # 存储文件名计数和冲突解决报告
     name_counter = defaultdict(int)
     conflict_report = {}
+    resolver = ConflictResolver(dest_dir)
+    copies = []
 
-    ignore_list = ['.DS_Store']
+    # 目标目录位于源目录内时，不再遍历目标目录
+    dest_abs = os.path.abspath(dest_dir)
 
     # 递归遍历源目录
-    for root, _, files in os.walk(src_dir):
-        for filename in files:
-            if filename in ignore_list:
-                continue
-            src_path = os.path.join(root, filename)
+    for entry in walk_files(src_dir, dest_abs):
+        filename = entry.name
+        if filename in IGNORED_FILES:
+            continue
+        src_path = entry.path
             
-            # 生成基本目标路径
-            base_name, ext = os.path.splitext(filename)
-            dest_name = filename
-            conflict_level = 0
+        # 处理文件名冲突
+        dest_name, conflict_level = resolver.resolve(filename)
             
-            # 处理文件名冲突
-            while os.path.exists(os.path.join(dest_dir, dest_name)):
-                conflict_level += 1
-                dest_name = f"{base_name}_{conflict_level}{ext}"
+        # 更新文件名计数器
+        name_counter[filename] += 1
             
-            # 更新文件名计数器
-            name_counter[filename] += 1
+        # 记录待复制的文件
+        dest_path = os.path.join(dest_dir, dest_name)
+        copies.append((src_path, dest_path))
             
-            # 复制文件
-            dest_path = os.path.join(dest_dir, dest_name)
-            shutil.copy2(src_path, dest_path)
+        # 记录冲突解决情况
+        if conflict_level > 0:
+            conflict_report[src_path] = {
+                "original_name": filename,
+                "new_name": dest_name,
+                "conflict_level": conflict_level
+            }
             
-            # 记录冲突解决情况
-            if conflict_level > 0:
-                conflict_report[src_path] = {
-                    "original_name": filename,
-                    "new_name": dest_name,
-                    "conflict_level": conflict_level
-                }
-            
-            logger.info(f"复制: {src_path} -> {dest_path}")
+        logger.debug("复制: %s -> %s", src_path, dest_path)
+
+    # 目标文件名都已确定，复制可以并发进行
+    # copy_file_range等系统调用期间会释放GIL，多个线程同时复制可以加深I/O队列，让存储设备保持繁忙
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        for copied_count, _ in enumerate(executor.map(lambda copy: copy_file(*copy), copies), 1):
+            if copied_count % PROGRESS_INTERVAL == 0:
+                logger.info(f"复制进度: {copied_count}")
     
+    logger.info(f"共复制 {len(copies)} 个文件")
     return conflict_report
 
 
@@ -92,6 +209,26 @@ def generate_conflict_report(report):
     return report_str
   
 
+def setup_logging():
+    """
+    配置日志：逐个文件的明细以DEBUG级别缓冲写入日志文件，控制台只输出INFO级别的汇总信息
+    只在直接运行本脚本时调用，organize_photos导入本模块时沿用自己的日志配置
+    """
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler('merge_all.log', encoding='utf-8', delay=True)
+    file_handler.setFormatter(log_formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.handlers.MemoryHandler(1000, flushLevel=logging.WARNING, target=file_handler),
+            console_handler
+        ]
+    )
+
+
 def mere_all(source_dir: str, dest_dir: str):
       # 验证路径有效性
     if not os.path.isdir(source_dir):
@@ -114,6 +251,7 @@ def mere_all(source_dir: str, dest_dir: str):
 
 
 if __name__ == "__main__":
+    setup_logging()
     # 用户输入源目录和目标目录
     source_dir = input("请输入源目录路径: ").strip()
     dest_dir = input("请输入目标目录路径: ").strip()
@@ -5,82 +5,185 @@
 1. 读取照片拍摄时间并分类到camera/photo目录
 2. 重命名照片为IMG_日期_时间格式
 3. 按年份分组照片
+以上三步在一次遍历中完成，每张照片只移动一次
 """
 
 import argparse
 from collections import defaultdict
-import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
 import logging
+import logging.handlers
 import shutil
+import struct
+import subprocess
 import sys
 import os
-import os.path
-from PIL import Image, ExifTags
-from datetime import datetime
+import re
+from PIL import Image
+
+# 哈希计算和持久化缓存与file_unique共用同一套实现（相同的并行阈值、同一张缓存表）
+from file_unique import DEFAULT_CACHE_PATH, PARALLEL_THRESHOLD, MetadataCache, calculate_digest
+# 文件名冲突处理、遍历和复制与merge_all共用
+from merge_all import (COPY_WORKERS, IGNORED_FILES, PROGRESS_INTERVAL, ConflictResolver, clone_file,
+                       fast_copy, walk_files)
+# EXIF结构解析与other目录下的脚本共用
+from exif_utils import (DATETIME_ORIGINAL, EXIF_IFD_POINTER, parse_exif_datetime_string,
+                        read_jpeg_exif_datetime, read_tiff_exif_datetime)
 
 # 配置日志
+# 逐个文件的明细为DEBUG级别，只在--verbose时缓冲写入日志文件，控制台只输出INFO级别的汇总信息
+# 默认级别为INFO，循环中的DEBUG日志直接被跳过，不会格式化消息
+log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+file_handler = logging.FileHandler('photo_organizer.log', encoding='utf-8', delay=True)
+file_handler.setFormatter(log_formatter)
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.INFO)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('photo_organizer.log'),
-        logging.StreamHandler()
+        logging.handlers.MemoryHandler(1000, flushLevel=logging.WARNING, target=file_handler),
+        console_handler
     ]
 )
+logging.getLogger('PIL').setLevel(logging.INFO)
 logger = logging.getLogger(__name__)
 
-def copy_files_with_conflict_resolution(src_dir, dest_dir):
+
+def copy_file(src_path, dest_path, link=False, reflink=False):
+    """
+    复制单个文件，可选用硬链接或写时复制克隆代替逐字节复制
+    参数:
+        src_path (str): 源文件路径
+        dest_path (str): 目标文件路径
+        link (bool): 先尝试创建硬链接（源和目标需在同一文件系统）
+        reflink (bool): 先尝试FICLONE克隆（仅Linux，需文件系统支持）
+    """
+    if link:
+        try:
+            os.link(src_path, dest_path)
+            return
+        except OSError as e:
+            logger.debug("硬链接失败，改为复制: %s (%s)", src_path, e)
+
+    if reflink:
+        if clone_file(src_path, dest_path):
+            return
+        logger.debug("克隆失败，改为复制: %s", src_path)
+
+    fast_copy(src_path, dest_path)
+
+
+def route_file(dest_dir, filename):
+    """
+    按扩展名决定文件在目标目录中的位置
+    参数:
+        dest_dir (str): 目标目录路径
+        filename (str): 文件名
+    返回:
+        str: 图片放入image子目录，视频放入video子目录，其他文件留在目标目录
+    """
+    _, ext = os.path.splitext(filename)
+    subdir = EXTENSION_DIRS.get(ext.lower())
+    return os.path.join(dest_dir, subdir) if subdir else dest_dir
+
+
+def copy_files_with_conflict_resolution(src_dir, dest_dir, skip_duplicates=False,
+                                        link=False, reflink=False, route=False):
     """
     递归复制所有文件到目标目录，解决文件名冲突
     参数:
         src_dir (str): 源目录路径
         dest_dir (str): 目标目录路径
+        skip_duplicates (bool): 复制时跳过内容重复的文件，无需复制后再扫描去重
+            只对大小与其他文件相同的文件在复制前计算哈希值，重复文件不会写入目标目录
+        link (bool): 同一文件系统时用硬链接代替复制
+        reflink (bool): 支持时用写时复制克隆代替复制
+        route (bool): 复制时直接把图片和视频放入image/video子目录，省去复制后再分类的一轮遍历
     返回:
         dict: 文件名冲突解决报告
     """
     # 创建目标目录（如果不存在）
     os.makedirs(dest_dir, exist_ok=True)
     
-    # 存储文件名计数和冲突解决报告
-    name_counter = defaultdict(int)
+    # 冲突解决报告
     conflict_report = {}
 
-    ignore_list = ['.DS_Store']
-
-    # 递归遍历源目录
-    for root, _, files in os.walk(src_dir):
-        for filename in files:
-            if filename in ignore_list:
+    # 实际写入的目录 -> 文件名冲突解决器
+    target_dirs = [dest_dir]
+    if route:
+        target_dirs += [os.path.join(dest_dir, 'image'), os.path.join(dest_dir, 'video')]
+    resolvers = {}
+    for target_dir in target_dirs:
+        os.makedirs(target_dir, exist_ok=True)
+        resolvers[target_dir] = ConflictResolver(target_dir)
+
+    # 目标目录位于源目录内时，不再遍历目标目录
+    dest_abs = os.path.abspath(dest_dir)
+    sources = [entry for entry in walk_files(src_dir, dest_abs) if entry.name not in IGNORED_FILES]
+
+    # 已复制文件的哈希值 -> 目标路径（目标目录中原有的文件也参与去重）
+    # 大小唯一的文件不可能与其他文件重复，只有大小相同的文件才需要在复制前计算哈希值，
+    # 重复文件在复制前就被跳过，不会先写入目标目录再删除
+    seen_digests = {}
+    size_counts = defaultdict(int)
+    if skip_duplicates:
+        for entry in sources:
+            size_counts[entry.stat().st_size] += 1
+        existing = []
+        for target_dir in target_dirs:
+            with os.scandir(target_dir) as entries:
+                existing += [(entry.path, entry.stat().st_size) for entry in entries if entry.is_file()]
+        for filepath, size in sorted(existing):
+            if size in size_counts:
+                size_counts[size] += 1
+                digest = cached_digest(filepath)
+                if digest:
+                    seen_digests.setdefault(digest, filepath)
+
+    copies = []
+    for entry in sources:
+        filename = entry.name
+        src_path = entry.path
+
+        # 跳过内容重复的文件
+        digest = None
+        if skip_duplicates and size_counts[entry.stat().st_size] > 1:
+            digest = cached_digest(src_path)
+            if digest in seen_digests:
+                logger.debug("跳过重复文件: %s (与 %s 相同)", src_path, seen_digests[digest])
                 continue
-            src_path = os.path.join(root, filename)
-            
-            # 生成基本目标路径
-            base_name, ext = os.path.splitext(filename)
-            dest_name = filename
-            conflict_level = 0
             
-            # 处理文件名冲突
-            while os.path.exists(os.path.join(dest_dir, dest_name)):
-                conflict_level += 1
-                dest_name = f"{base_name}_{conflict_level}{ext}"
+        # 处理文件名冲突
+        target_dir = route_file(dest_dir, filename) if route else dest_dir
+        dest_name, conflict_level = resolvers[target_dir].resolve(filename)
             
-            # 更新文件名计数器
-            name_counter[filename] += 1
+        # 记录待复制的文件
+        dest_path = os.path.join(target_dir, dest_name)
+        copies.append((src_path, dest_path))
+        if digest:
+            seen_digests[digest] = dest_path
             
-            # 复制文件
-            dest_path = os.path.join(dest_dir, dest_name)
-            shutil.copy2(src_path, dest_path)
+        # 记录冲突解决情况
+        if conflict_level > 0:
+            conflict_report[src_path] = {
+                "original_name": filename,
+                "new_name": dest_name,
+                "conflict_level": conflict_level
+            }
             
-            # 记录冲突解决情况
-            if conflict_level > 0:
-                conflict_report[src_path] = {
-                    "original_name": filename,
-                    "new_name": dest_name,
-                    "conflict_level": conflict_level
-                }
-            
-            logger.info(f"复制: {src_path} -> {dest_path}")
-    
+        logger.debug("复制: %s -> %s", src_path, dest_path)
+
+    # 目标文件名都已确定，复制可以并发进行
+    # copy_file_range等系统调用期间会释放GIL，多个线程同时复制可以加深I/O队列，让存储设备保持繁忙
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        copies_done = executor.map(lambda copy: copy_file(*copy, link=link, reflink=reflink), copies)
+        for copied_count, _ in enumerate(copies_done, 1):
+            if copied_count % PROGRESS_INTERVAL == 0:
+                logger.info(f"复制进度: {copied_count}")
+
+    logger.info(f"共复制 {len(copies)} 个文件")
     return conflict_report
 
 
@@ -103,14 +206,16 @@ def generate_conflict_report(report):
     return report_str
   
 
-def mere_all_files(source_dir: str, dest_dir: str):
+def mere_all_files(source_dir: str, dest_dir: str, skip_duplicates=False,
+                   link=False, reflink=False, route=False):
       # 验证路径有效性
     if not os.path.isdir(source_dir):
         logger.error("错误: 源目录不存在或不是目录")
         exit(1)
     
     logger.info(f"\n开始复制文件: {source_dir} → {dest_dir}")
-    report = copy_files_with_conflict_resolution(source_dir, dest_dir)
+    report = copy_files_with_conflict_resolution(source_dir, dest_dir, skip_duplicates,
+                                                 link=link, reflink=reflink, route=route)
     
     # 生成并记录报告
     report_str = generate_conflict_report(report)
@@ -124,286 +229,300 @@ def mere_all_files(source_dir: str, dest_dir: str):
     print(report_str)
 
 
-def calculate_md5(filepath):
-    """计算文件的MD5哈希值（支持大文件）"""
-    hash_md5 = hashlib.md5()
+# 启用持久化缓存时为MetadataCache实例（命令行参数 --cache）
+metadata_cache = None
+
+
+def cached_digest(filepath):
+    """计算文件的哈希值，启用持久化缓存时优先从缓存读取"""
+    if metadata_cache is None:
+        return calculate_digest(filepath)
+
     try:
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    except (IOError, PermissionError):
+        st = os.stat(filepath)
+    except OSError:
         return None
+    digest = metadata_cache.get(filepath, 'digest', st)
+    if digest is None:
+        digest = calculate_digest(filepath)
+        if digest:
+            metadata_cache.set(filepath, 'digest', digest, st)
+    return digest
 
-def find_duplicate_files(directory):
-    """查找并分组重复文件"""
-    md5_groups = defaultdict(list)
-    
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
-        if os.path.isfile(filepath):
-            md5 = calculate_md5(filepath)
-            if md5:
-                md5_groups[md5].append(filepath)
-    
-    return {k: v for k, v in md5_groups.items() if len(v) > 1}
-
-def delete_duplicates(duplicates, simulate=False):
-    """删除重复文件（保留每组第一个文件）"""
-    deletion_log = []
-    for md5, file_list in duplicates.items():
-        # 按文件名排序确保一致性
-        sorted_files = sorted(file_list)
-        keeper = sorted_files[0]
-        
-        for filepath in sorted_files[1:]:
-            if simulate:
-                deletion_log.append(f"[SIMULATE] 将删除: {filepath} (保留 {keeper})")
-            else:
-                try:
-                    os.remove(filepath)
-                    deletion_log.append(f"已删除: {filepath} (保留 {keeper})")
-                except Exception as e:
-                    deletion_log.append(f"删除失败 {filepath}: {str(e)}")
-    
-    return deletion_log
-  
 
-def find_and_delete_duplicates(source_dir, simulate=False):
-    if not os.path.isdir(source_dir):
-        print("错误: 目录不存在")
-        return
+# 支持的图片和视频扩展名
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'})
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.mpeg'})
 
-    print(f"扫描目录: {source_dir}")
-    duplicates = find_duplicate_files(source_dir)
-    
-    if not duplicates:
-        print("✅ 未发现重复文件")
-        return
+# 扩展名 -> 分类子目录名
+EXTENSION_DIRS = {ext: 'image' for ext in IMAGE_EXTENSIONS}
+EXTENSION_DIRS.update({ext: 'video' for ext in VIDEO_EXTENSIONS})
 
-    # 打印重复文件分组
-    print("\n发现重复文件组:")
-    for i, (md5, files) in enumerate(duplicates.items(), 1):
-        print(f"\n组 #{i} (MD5: {md5}):")
-        for f in sorted(files):
-            print(f"  - {os.path.basename(f)}")
 
-    # 删除重复文件
-    print("\n处理重复文件...")
-    log = delete_duplicates(duplicates, simulate=simulate)
-    
-    print("\n操作日志:")
-    for entry in log:
-        print(entry)
-    
-    print(f"\n总计: 发现 {len(duplicates)} 组重复文件，已处理 {len(log)} 个重复项")
+JPEG_EXTENSIONS = {'.jpg', '.jpeg'}
+# 基于TIFF结构的格式（CR2/NEF等RAW），EXIF就在文件开头的TIFF结构中
+TIFF_EXTENSIONS = {'.tif', '.tiff', '.cr2', '.nef'}
 
 
-# 支持的图片和视频扩展名
-IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
-VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.mpeg'}
+# 拍摄时间缓存: (设备, inode, 修改时间, 大小) -> 拍摄时间
+# 不以路径为键，照片在分类步骤被移动后，重命名步骤仍能命中缓存
+exif_datetime_cache = {}
 
-def classify_files(directory):
-    """
-    分类目录中的文件：
-    - 图片移动到image目录
-    - 视频移动到video目录
-    - 其他文件保留在根目录
-    """
-    # 创建目标目录
-    image_dir = os.path.join(directory, 'image')
-    video_dir = os.path.join(directory, 'video')
-    os.makedirs(image_dir, exist_ok=True)
-    os.makedirs(video_dir, exist_ok=True)
-    
-    # 遍历目录中的文件
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
-        
-        # 跳过目录
-        if os.path.isdir(filepath):
-            continue
-            
-        # 获取文件扩展名
-        _, ext = os.path.splitext(filename)
-        ext = ext.lower()
-        
-        # 分类文件
-        if ext in IMAGE_EXTENSIONS:
-            dest = os.path.join(image_dir, filename)
-            shutil.move(filepath, dest)
-            print(f"移动图片: {filename} -> image/")
-            
-        elif ext in VIDEO_EXTENSIONS:
-            dest = os.path.join(video_dir, filename)
-            shutil.move(filepath, dest)
-            print(f"移动视频: {filename} -> video/")
-            
-        else:
-            print(f"保留文件: {filename}")
 
 def get_exif_datetime(image_path):
     """
-    获取照片的拍摄时间
+    获取照片的拍摄时间（同一次运行中每个文件只解析一次，启用持久化缓存时跨运行复用）
     返回格式: YYYY:MM:DD HH:MM:SS 或 None
     """
     try:
-        with Image.open(image_path) as img:
-            exif = img._getexif()
-            if exif:
-                for tag, value in exif.items():
-                    if ExifTags.TAGS.get(tag) == 'DateTimeOriginal':
-                        # 处理异常时间格式
-                        clean_value = value.split('.')[0]  # 移除毫秒部分
-                        clean_value = clean_value[:19]  # 确保长度正确
-                        return clean_value
-    except Exception as e:
+        st = os.stat(image_path)
+    except OSError as e:
         logger.error(f"读取 {image_path} EXIF 失败: {str(e)}")
-    return None
+        return None
+
+    key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+    if key in exif_datetime_cache:
+        return exif_datetime_cache[key]
 
+    # 持久化缓存中用空字符串表示"没有拍摄时间"
+    value = metadata_cache.get(image_path, 'exif', st) if metadata_cache is not None else None
+    if value is None:
+        value = read_exif_datetime(image_path)
+        if metadata_cache is not None:
+            metadata_cache.set(image_path, 'exif', value or '', st)
+    exif_datetime_cache[key] = value or None
+    return exif_datetime_cache[key]
 
-def create_target_filename(dt_str, ext, existing_files):
+
+def read_exif_datetimes_with_exiftool(image_paths):
     """
-    创建目标文件名并解决冲突
+    用一个exiftool进程批量读取多个文件的拍摄时间，摊薄每个文件的进程启动开销
+    未安装exiftool或调用失败时返回空字典
+    返回:
+        dict: {文件路径: 拍摄时间字符串或None}
     """
+    exiftool = shutil.which('exiftool')
+    if not exiftool or not image_paths:
+        return {}
+
+    # 文件列表通过标准输入的参数文件传入，避免命令行过长
+    cmd = [exiftool, '-json', '-fast', '-charset', 'filename=utf8', '-DateTimeOriginal', '-@', '-']
     try:
-        dt_obj = datetime.strptime(dt_str, "%Y:%m:%d %H:%M:%S")
-        base_name = f"IMG_{dt_obj.strftime('%Y%m%d_%H%M%S')}"
-        target_name = f"{base_name}{ext}"
-        
-        # 解决文件名冲突
-        counter = 1
-        while target_name in existing_files:
-            target_name = f"{base_name}_{counter}{ext}"
-            counter += 1
-            
-        return target_name
-    except ValueError:
-        logger.error(f"无效的日期时间格式: {dt_str}")
-        return None
+        result = subprocess.run(cmd, input='\n'.join(image_paths), capture_output=True,
+                                text=True, encoding='utf-8')
+        records = json.loads(result.stdout or '[]')
+    except (OSError, ValueError) as e:
+        logger.warning(f"exiftool 批量读取失败: {str(e)}")
+        return {}
+
+    datetimes = {}
+    for record in records:
+        value = record.get('DateTimeOriginal')
+        datetimes[record['SourceFile']] = str(value).split('.')[0][:19] if value else None
+    return datetimes
+
+
+def store_exif_datetime(image_path, value):
+    """把批量读取到的拍摄时间写入内存缓存，启用持久化缓存时同时写入"""
+    try:
+        st = os.stat(image_path)
+    except OSError:
+        return
+    exif_datetime_cache[(st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)] = value
+    if metadata_cache is not None:
+        metadata_cache.set(image_path, 'exif', value or '', st)
 
 
-def classify_photos(source_path, camera_dir, photo_dir):
+def prefetch_exif_datetimes(image_paths):
     """
-    步骤1: 分类照片到camera和photo目录
+    批量读取照片的拍摄时间并写入缓存
+    非JPEG照片交给一个exiftool进程批量读取（JPEG直接解析EXIF段已经足够快）；
+    其余照片较多时分发到多个进程并行解析
+    这是一个生成器：每张照片的拍摄时间就绪（已写入缓存或可由get_exif_datetime直接读取）后返回其路径，
+    每个路径返回一次，多进程解析的照片按输入顺序返回；调用方可以在后台进程继续解析的同时处理已就绪的照片
     """
-    logger.info(f"开始分类照片: {source_path}")
-    
-    # 获取所有文件
-    all_files = os.listdir(source_path)
-    image_exts = ['.jpg', '.jpeg', '.png', '.cr2', '.nef']
-    
-    for filename in all_files:
-        file_path = os.path.join(source_path, filename)
-        if not os.path.isfile(file_path):
-            continue
-            
-        _, ext = os.path.splitext(filename)
-        if ext.lower() in image_exts:
-            dt_str = get_exif_datetime(file_path)
-            if dt_str:
-                logger.info(f"{filename} - 拍摄时间: {dt_str}")
-                target_path = os.path.join(camera_dir, filename)
-                os.rename(file_path, target_path)
+    if metadata_cache is not None:
+        uncached = []
+        for path in image_paths:
+            if metadata_cache.get(path, 'exif') is None:
+                uncached.append(path)
             else:
-                logger.info(f"{filename} - 无拍摄时间")
-                target_path = os.path.join(photo_dir, filename)
-                os.rename(file_path, target_path)
-    
-    camera_count = len(os.listdir(camera_dir))
-    photo_count = len(os.listdir(photo_dir))
-    logger.info(f"照片分类完成! camera: {camera_count}张, photo: {photo_count}张")
+                yield path
+        image_paths = uncached
+
+    other_paths = [p for p in image_paths if os.path.splitext(p)[1].lower() not in JPEG_EXTENSIONS]
+    fetched = read_exif_datetimes_with_exiftool(other_paths)
+    for path, value in fetched.items():
+        store_exif_datetime(path, value)
+        yield path
+
+    # 照片较少时由get_exif_datetime逐个读取，避免进程启动开销
+    remaining = [p for p in image_paths if p not in fetched]
+    if len(remaining) < PARALLEL_THRESHOLD:
+        yield from remaining
+        return
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for path, value in zip(remaining, executor.map(read_exif_datetime, remaining, chunksize=32)):
+            store_exif_datetime(path, value)
+            yield path
 
 
-def rename_photos(camera_dir):
+def read_exif_datetime(image_path):
     """
-    步骤3: 重命名照片文件
+    读取照片EXIF中的拍摄时间
+    JPEG和TIFF结构的文件优先直接解析EXIF，其他格式或解析失败时使用Pillow读取
+    返回格式: YYYY:MM:DD HH:MM:SS 或 None
     """
-    logger.info(f"开始重命名照片: {camera_dir}")
-    
-    camera_files = os.listdir(camera_dir)
-    existing_names = camera_files.copy()
-    renamed_count = 0
-    skipped_count = 0
-    
-    for filename in camera_files:
-        file_path = os.path.join(camera_dir, filename)
-        if not os.path.isfile(file_path):
-            continue
-            
-        dt_str = get_exif_datetime(file_path)
-        if not dt_str:
-            continue
-            
-        _, ext = os.path.splitext(filename)
-        # 检查是否需要重命名
-        new_name = create_target_filename(dt_str, ext, existing_names)
-        if not new_name:
-            continue
-            
-        if filename != new_name:
-            logger.info(f"重命名: {filename} -> {new_name}")
-            new_path = os.path.join(camera_dir, new_name)
-            os.rename(file_path, new_path)
-            existing_names.remove(filename)
-            existing_names.append(new_name)
-            renamed_count += 1
-        else:
-            logger.info(f"跳过重命名: {filename} 已符合命名规则")
-            skipped_count += 1
-    
-    logger.info(f"重命名完成! 已重命名: {renamed_count}张, 跳过: {skipped_count}张")
+    ext = os.path.splitext(image_path)[1].lower()
+    if ext in JPEG_EXTENSIONS:
+        fast_reader = read_jpeg_exif_datetime
+    elif ext in TIFF_EXTENSIONS:
+        fast_reader = read_tiff_exif_datetime
+    else:
+        fast_reader = None
+
+    if fast_reader:
+        try:
+            value = fast_reader(image_path)
+            if value:
+                # 处理异常时间格式
+                return value.split('.')[0][:19]
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logger.debug("快速解析 %s EXIF 失败，改用Pillow: %s", image_path, e)
+
+    try:
+        with Image.open(image_path) as img:
+            # 按标签ID直接读取Exif子IFD中的DateTimeOriginal，不遍历全部标签
+            value = img.getexif().get_ifd(EXIF_IFD_POINTER).get(DATETIME_ORIGINAL)
+            if value:
+                # 处理异常时间格式
+                clean_value = value.split('.')[0]  # 移除毫秒部分
+                clean_value = clean_value[:19]  # 确保长度正确
+                return clean_value
+    except Exception as e:
+        logger.error(f"读取 {image_path} EXIF 失败: {str(e)}")
+    return None
 
 
-def group_by_year(camera_dir):
+def format_target_name(dt, ext):
     """
-    步骤4: 按年份分组照片
+    按拍摄时间生成目标文件名 IMG_YYYYMMDD_HHMMSS.ext（不含冲突序号）
+    参数:
+        dt (datetime): 拍摄时间
+        ext (str): 扩展名
     """
-    logger.info(f"开始按年份分组照片: {camera_dir}")
-    
-    moved_count = 0
-    for filename in os.listdir(camera_dir):
-        file_path = os.path.join(camera_dir, filename)
-        if not os.path.isfile(file_path):
-            continue
-            
-        if filename.startswith("IMG_") and len(filename) >= 12:
-            year = filename[4:8]  # 从 IMG_YYYYMMDD... 提取年份
-            if year.isdigit():
-                year_dir = os.path.join(camera_dir, year)
-                if not os.path.exists(year_dir):
-                    os.makedirs(year_dir)
-                target_path = os.path.join(year_dir, filename)
-                logger.info(f"移动 {filename} -> {year}/")
-                os.rename(file_path, target_path)
-                moved_count += 1
+    return (f"IMG_{dt.year:04d}{dt.month:02d}{dt.day:02d}_"
+            f"{dt.hour:02d}{dt.minute:02d}{dt.second:02d}{ext}")
+
+
+# 需要读取拍摄时间的照片扩展名
+PHOTO_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.cr2', '.nef'})
+
+# 已按拍摄时间命名的文件: IMG_YYYYMMDD_HHMMSS.ext 或带冲突序号的 IMG_YYYYMMDD_HHMMSS_N.ext
+STANDARD_NAME_PATTERN = re.compile(r'^IMG_\d{8}_\d{6}(_\d+)?\.\w+$', re.IGNORECASE)
+
+
+def plan_photo_target(filename, file_path, camera_dir, photo_dir):
+    """
+    计算照片的目标目录和目标文件名（冲突序号由调用方解决）
+    - 有拍摄时间: camera/YYYY/IMG_YYYYMMDD_HHMMSS.ext
+    - 有拍摄时间且已按拍摄时间命名: 保留文件名（含冲突序号），放入拍摄年份目录
+    - 拍摄时间格式无效: 保留文件名放在camera目录
+    - 无拍摄时间: photo目录（与文件名无关）
+    返回:
+        tuple: (目标目录, 目标文件名)
+    """
+    dt_str = get_exif_datetime(file_path)
+    if not dt_str:
+        logger.debug("%s - 无拍摄时间", filename)
+        return photo_dir, filename
+
+    logger.debug("%s - 拍摄时间: %s", filename, dt_str)
+    try:
+        dt = parse_exif_datetime_string(dt_str)
+    except ValueError:
+        logger.error(f"无效的日期时间格式: {dt_str}")
+        return camera_dir, filename
+    year_dir = os.path.join(camera_dir, f"{dt.year:04d}")
+    # 文件名只用来跳过重命名，分类和年份始终以EXIF拍摄时间为准
+    if STANDARD_NAME_PATTERN.match(filename):
+        return year_dir, filename
+    _, ext = os.path.splitext(filename)
+    return year_dir, format_target_name(dt, ext)
+
+
+def classify_photos(source_path, camera_dir, photo_dir):
+    """
+    分类、重命名并按年份分组照片，一次遍历完成：
+    每张照片只读取一次EXIF，只移动一次，直接放到最终位置
+    """
+    logger.info(f"开始整理照片: {source_path}")
+    
+    # 获取所有照片文件
+    photo_files = []
+    with os.scandir(source_path) as entries:
+        for entry in entries:
+            # 先按扩展名过滤，只对照片文件检查文件类型
+            _, ext = os.path.splitext(entry.name)
+            if ext.lower() in PHOTO_EXTENSIONS and entry.is_file():
+                photo_files.append((entry.inode(), entry.name, entry.path))
+    # 按inode顺序读取EXIF，文件在磁盘上的位置大致与inode顺序一致，可减少机械硬盘寻道
+    photo_files.sort()
+
+    # 后台进程按顺序解析EXIF，主线程作为唯一的移动者，照片的拍摄时间一就绪就移动它，
+    # 解析和移动同时进行；照片在解析完成前不会被移走，移动也不会互相冲突
+    exif_paths = [file_path for _, _, file_path in photo_files]
+    prefetched = prefetch_exif_datetimes(exif_paths)
+    pending = set(exif_paths)
+    ready = set()
+
+    # 目标目录 -> 文件名冲突解决器，每个目录只创建和读取一次
+    resolvers = {}
+    camera_count = 0
+    photo_count = 0
+    for _, filename, file_path in photo_files:
+        # 先等待该照片的拍摄时间就绪
+        while file_path in pending and file_path not in ready:
+            path = next(prefetched, None)
+            if path is None:
+                break
+            ready.add(path)
+
+        target_dir, target_name = plan_photo_target(filename, file_path, camera_dir, photo_dir)
+        if target_dir not in resolvers:
+            os.makedirs(target_dir, exist_ok=True)
+            resolvers[target_dir] = ConflictResolver(target_dir)
+
+        # 目标目录中已有同名文件时追加序号，避免覆盖
+        target_name, _ = resolvers[target_dir].resolve(target_name)
+        target_path = os.path.join(target_dir, target_name)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("移动 %s -> %s", filename, os.path.relpath(target_path, source_path))
+        os.rename(file_path, target_path)
+
+        if target_dir == photo_dir:
+            photo_count += 1
+        else:
+            camera_count += 1
     
-    logger.info(f"年份分组完成! 已移动: {moved_count}张照片")
+    logger.info(f"照片分类完成! camera: {camera_count}张, photo: {photo_count}张")
     
     
 def classify_and_rename_photos(source_path):
     """
-    步骤1: 分类照片到camera和photo目录
+    整理照片：有拍摄时间的照片按时间重命名并按年份放入camera目录，其余放入photo目录
     """
     # 创建分类目录
     camera_dir = os.path.join(source_path, "camera")
     photo_dir = os.path.join(source_path, "photo")
     
-    if not os.path.exists(camera_dir):
-        os.makedirs(camera_dir)
-    if not os.path.exists(photo_dir):
-        os.makedirs(photo_dir)
-    
-    # 执行处理步骤
-    classify_photos(source_path, camera_dir, photo_dir)  # 步骤1
-    
-    # 步骤2: 进入camera目录
-    os.chdir(camera_dir)
-    logger.info(f"当前工作目录: {camera_dir}")
+    os.makedirs(camera_dir, exist_ok=True)
+    os.makedirs(photo_dir, exist_ok=True)
     
-    rename_photos(camera_dir)  # 步骤3
-    group_by_year(camera_dir)  # 步骤4
+    classify_photos(source_path, camera_dir, photo_dir)
     
+    exif_datetime_cache.clear()
     logger.info("照片整理完成!")
 
 
@@ -411,30 +530,40 @@ def main():
     parser = argparse.ArgumentParser(description='整理照片工具')
     parser.add_argument('source_dir', type=str, help='源目录路径')
     parser.add_argument('target_dir', type=str, help='目标目录路径')
+    parser.add_argument('--link', action='store_true', help='同一文件系统时用硬链接代替复制')
+    parser.add_argument('--reflink', action='store_true', help='支持时用写时复制克隆代替复制(Linux)')
+    parser.add_argument('--cache', action='store_true',
+                        help=f'缓存文件哈希值和拍摄时间，重复运行时跳过未变化的文件 ({DEFAULT_CACHE_PATH})')
+    parser.add_argument('--verbose', action='store_true', help='在日志文件中记录每个文件的处理明细')
     args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
     
     source_path = os.path.abspath(args.source_dir)
     if not os.path.isdir(source_path):
         logger.error(f"目录不存在: {source_path}")
         sys.exit(1)
+
+    global metadata_cache
+    if args.cache:
+        metadata_cache = MetadataCache()
     
-    # 合并所有文件
-    target_path = os.path.abspath(args.target_dir)
-    logger.info(f"开始合并所有文件: {source_path} → {target_path}")
-    mere_all_files(source_path, target_path)
-    
-    # 删除所有重复文件
-    logger.info(f"删除所有重复文件: {target_path}")
-    find_and_delete_duplicates(target_path)
-    
-    # 分类文件
-    logger.info(f"分类文件: {target_path}")
-    classify_files(target_path)
-    
-    # 分类和重命名文件
-    image_path = os.path.join(target_path, "image")
-    logger.info(f"分类和重命名文件: {image_path}")
-    classify_and_rename_photos(image_path)
+    try:
+        # 合并所有文件，复制的同时跳过重复文件，并直接分类到image/video目录
+        target_path = os.path.abspath(args.target_dir)
+        logger.info(f"开始合并并分类所有文件(跳过重复文件): {source_path} → {target_path}")
+        mere_all_files(source_path, target_path, skip_duplicates=True,
+                       link=args.link, reflink=args.reflink, route=True)
+        
+        # 分类和重命名文件
+        image_path = os.path.join(target_path, "image")
+        logger.info(f"分类和重命名文件: {image_path}")
+        classify_and_rename_photos(image_path)
+    finally:
+        # 出错时也写入缓冲中尚未提交的缓存记录
+        if metadata_cache is not None:
+            metadata_cache.close()
 
 
 if __name__ == "__main__":
@@ -1,20 +1,92 @@
 # 把照片分类为有拍摄时间和无拍摄时间两类，有拍摄时间的放在camera目录下，无拍摄时间的放在photo目录下
 
 import os
-import shutil
-from pathlib import Path
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, UnidentifiedImageError
-from PIL.ExifTags import TAGS
 import logging
 from datetime import datetime
 import re  # 添加正则表达式模块
+import struct
+
+# EXIF解析和文件移动与上级目录的脚本共用
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from classify_files import move_file
+from exif_utils import DATETIME_ORIGINAL, EXIF_IFD_POINTER, parse_exif_datetime_string, read_jpeg_exif_datetime
+
+# 直接解析EXIF段的JPEG扩展名
+JPEG_EXTENSIONS = {'.jpg', '.jpeg'}
+
+# 支持的图片格式（小写）
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.heic')
+
+# 清理EXIF时间字符串中非法字符的正则（预编译，避免每次调用查找缓存）
+EXIF_CLEAN_PATTERN = re.compile(r"[^0-9: ]")
+
+# EXIF时间格式：仅日期
+EXIF_DATE_FORMAT = "%Y:%m:%d"
+
+# 照片数超过该值时才启用多进程解析EXIF，避免少量照片承担进程启动开销
+PARALLEL_THRESHOLD = 16
+
+def read_shooting_times(file_paths):
+    """
+    读取多个照片的拍摄时间，照片较多时分发到多个进程并行解析EXIF
+    
+    参数:
+        file_paths (list): 照片文件路径列表
+        
+    返回:
+        list: 拍摄时间列表（datetime或None），顺序与输入一致
+    """
+    if len(file_paths) <= PARALLEL_THRESHOLD:
+        return [get_shooting_time(file_path) for file_path in file_paths]
+    
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        return list(executor.map(get_shooting_time, file_paths, chunksize=64))
+
+def scan_images(root, exts, exclude_dirs=()):
+    """
+    递归遍历目录，逐个返回图片文件的DirEntry
+    先按文件名后缀过滤，只对可能是图片的条目判断文件类型；类型信息直接取自scandir结果，无需额外stat
+    
+    参数:
+        root (str): 要遍历的目录
+        exts (tuple): 小写扩展名元组（带点，不超过5个字符）
+        exclude_dirs (set): 不进入的目录路径
+        
+    返回:
+        generator: 图片文件的os.DirEntry
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            # 只把文件名末尾几个字符转为小写，再用endswith一次比较所有扩展名
+            if entry.name[-5:].lower().endswith(exts) and entry.is_file():
+                yield entry
+            elif entry.is_dir(follow_symlinks=False) and entry.path not in exclude_dirs:
+                yield from scan_images(entry.path, exts, exclude_dirs)
+
+def read_datetime_original(file_path):
+    """
+    读取照片EXIF中的DateTimeOriginal原始字符串
+    JPEG直接解析APP1段，其他格式或解析失败时使用Pillow读取
+    """
+    if os.path.splitext(file_path)[1].lower() in JPEG_EXTENSIONS:
+        try:
+            return read_jpeg_exif_datetime(file_path)
+        except (ValueError, struct.error):
+            pass
+    
+    with Image.open(file_path) as img:
+        # getexif()按需解析，按标签ID直接读取Exif子IFD中的拍摄时间
+        return img.getexif().get_ifd(EXIF_IFD_POINTER).get(DATETIME_ORIGINAL)
 
 def get_shooting_time(file_path):
     """
     获取照片拍摄时间（优先使用EXIF元数据）
     
     参数:
-        file_path (Path): 照片文件路径
+        file_path (str): 照片文件路径
         
     返回:
         datetime对象: 拍摄时间 (成功时)
@@ -22,95 +94,90 @@ def get_shooting_time(file_path):
     """
     try:
         # 尝试从EXIF元数据获取拍摄时间
-        with Image.open(file_path) as img:
-            exif_data = img._getexif()
-            if exif_data:
-                for tag_id, value in exif_data.items():
-                    tag_name = TAGS.get(tag_id, tag_id)
-                    if tag_name == "DateTimeOriginal":
-                        # 清理时间字符串中的非法字符
-                        clean_value = re.sub(r"[^0-9: ]", "", value)
-                        
-                        # 尝试解析时间
-                        try:
-                            return datetime.strptime(clean_value[:19], "%Y:%m:%d %H:%M:%S")
-                        except ValueError:
-                            # 尝试其他可能的格式
-                            try:
-                                return datetime.strptime(clean_value[:10], "%Y:%m:%d")
-                            except ValueError:
-                                logging.warning(f"无法解析 {file_path.name} 的拍摄时间: {value}")
-                                return None
+        value = read_datetime_original(file_path)
+        if value:
+            # 清理时间字符串中的非法字符
+            clean_value = EXIF_CLEAN_PATTERN.sub("", value)
+            
+            # 尝试解析时间
+            try:
+                return parse_exif_datetime_string(clean_value[:19])
+            except ValueError:
+                # 尝试其他可能的格式
+                try:
+                    return datetime.strptime(clean_value[:10], EXIF_DATE_FORMAT)
+                except ValueError:
+                    logging.warning(f"无法解析 {os.path.basename(file_path)} 的拍摄时间: {value}")
+                    return None
         
         return None
     
     except (UnidentifiedImageError, TypeError, ValueError, OSError) as e:
-        logging.warning(f"无法读取 {file_path.name} 的EXIF: {str(e)}")
+        logging.warning(f"无法读取 {os.path.basename(file_path)} 的EXIF: {str(e)}")
         return None
     except Exception as e:
-        logging.error(f"处理 {file_path.name} 时发生意外错误: {str(e)}")
+        logging.error(f"处理 {os.path.basename(file_path)} 时发生意外错误: {str(e)}")
         return None
 
 def classify_photos(source_dir):
     """主分类函数：递归遍历并分类照片"""
-    source_path = Path(source_dir).resolve()
-    camera_dir = source_path / "camera"
-    photo_dir = source_path / "photo"
+    source_path = os.path.realpath(source_dir)
+    camera_dir = os.path.join(source_path, "camera")
+    photo_dir = os.path.join(source_path, "photo")
     
     # 创建目标目录
-    camera_dir.mkdir(exist_ok=True)
-    photo_dir.mkdir(exist_ok=True)
+    os.makedirs(camera_dir, exist_ok=True)
+    os.makedirs(photo_dir, exist_ok=True)
     
-    # 支持的图片格式
-    image_exts = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.heic'}
     processed_count = 0
+    camera_count = 0
+    photo_count = 0
     error_count = 0
     
-    # 递归遍历文件夹
-    for root, _, files in os.walk(source_path):
-        current_dir = Path(root)
-        
-        # 跳过目标目录
-        if current_dir in [camera_dir, photo_dir]:
-            continue
+    # 递归遍历文件夹，跳过目标目录
+    prefix_len = len(source_path) + 1
+    file_paths = [entry.path for entry in scan_images(source_path, IMAGE_EXTENSIONS, {camera_dir, photo_dir})]
+    
+    # 已创建的目录，每个目录只调用一次makedirs
+    created_dirs = {camera_dir, photo_dir}
+    
+    # 并行读取拍摄时间，再在主进程中依次移动
+    for file_path, shoot_time in zip(file_paths, read_shooting_times(file_paths)):
+        try:
+            # 打印拍摄时间
+            time_str = shoot_time if shoot_time else "无拍摄时间"
+            print(f"{os.path.basename(file_path)} | 拍摄时间: {time_str}")
             
-        for file in files:
-            file_path = current_dir / file
-            ext = file_path.suffix.lower()
+            # 确定目标目录
+            if shoot_time:
+                dest_base = camera_dir
+            else:
+                dest_base = photo_dir
             
-            if ext not in image_exts:
-                continue
-                
-            try:
-                # 获取拍摄时间并打印
-                shoot_time = get_shooting_time(file_path)
-                time_str = shoot_time if shoot_time else "无拍摄时间"
-                print(f"{file_path.name} | 拍摄时间: {time_str}")
-                
-                # 确定目标目录
-                if shoot_time:
-                    dest_base = camera_dir
-                else:
-                    dest_base = photo_dir
-                
-                # 保持相对路径结构
-                relative_path = file_path.relative_to(source_path)
-                dest_path = dest_base / relative_path
-                
-                # 创建目标目录并移动文件
-                dest_path.parent.mkdir(parents=True, exist_ok=True)
-                shutil.move(str(file_path), str(dest_path))
-                processed_count += 1
-                
-            except Exception as e:
-                logging.error(f"处理 {file_path} 失败: {str(e)}")
-                error_count += 1
+            # 保持相对路径结构
+            dest_path = os.path.join(dest_base, file_path[prefix_len:])
+            
+            # 创建目标目录并移动文件
+            dest_parent = os.path.dirname(dest_path)
+            if dest_parent not in created_dirs:
+                os.makedirs(dest_parent, exist_ok=True)
+                created_dirs.add(dest_parent)
+            move_file(file_path, dest_path)
+            processed_count += 1
+            if shoot_time:
+                camera_count += 1
+            else:
+                photo_count += 1
+            
+        except Exception as e:
+            logging.error(f"处理 {file_path} 失败: {str(e)}")
+            error_count += 1
     
     # 输出统计结果
     print(f"\n{'='*40}")
     print(f"处理完成! 共处理 {processed_count} 张照片")
-    print(f"· 含拍摄时间: {len(list(camera_dir.rglob('*.*')))} 张 → camera/")
-    print(f"· 无拍摄时间: {len(list(photo_dir.rglob('*.*')))} 张 → photo/")
+    print(f"· 含拍摄时间: {camera_count} 张 → camera/")
+    print(f"· 无拍摄时间: {photo_count} 张 → photo/")
     if error_count > 0:
         print(f"⚠ 失败: {error_count} 张 (详见日志)")
 
@@ -125,7 +192,7 @@ if __name__ == "__main__":
     # 用户输入处理
     source_dir = input("请输入照片文件夹路径: ").strip()
     
-    if not Path(source_dir).exists():
+    if not os.path.exists(source_dir):
         print("错误: 路径不存在!")
     else:
         classify_photos(source_dir)
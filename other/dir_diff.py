@@ -2,30 +2,51 @@
 import os
 import hashlib
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import argparse
 
+# 计算哈希时每次读取的块大小，大块读取减少系统调用次数
+CHUNK_SIZE = 1024 * 1024
+
+# 文件数达到该值时才启用多进程并行计算哈希（进程启动有固定开销）
+PARALLEL_THRESHOLD = 16
+
 def calculate_file_hash(filepath):
     """计算文件的MD5哈希值（支持大文件）"""
     hash_md5 = hashlib.md5()
     try:
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+        with open(filepath, "rb", buffering=0) as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
                 hash_md5.update(chunk)
         return hash_md5.hexdigest()
     except (IOError, OSError):
         return None
 
+def hash_files(filepaths):
+    """
+    计算多个文件的哈希值，文件较多时分发到多个进程并行计算
+    返回:
+        list: 哈希值列表，顺序与输入一致
+    """
+    if len(filepaths) < PARALLEL_THRESHOLD:
+        return [calculate_file_hash(filepath) for filepath in filepaths]
+
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(calculate_file_hash, filepaths, chunksize=16))
+
 def scan_folder(directory):
     """扫描文件夹并返回{哈希值: [文件名列表]}的映射"""
+    filenames = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name != '.DS_Store' and entry.is_file():
+                filenames.append(entry.name)
+
     content_map = defaultdict(list)
-    for filename in os.listdir(directory):
-        if filename == '.DS_Store':
-            continue
-        filepath = os.path.join(directory, filename)
-        if os.path.isfile(filepath):
-            file_hash = calculate_file_hash(filepath)
-            if file_hash:
-                content_map[file_hash].append(filename)
+    filepaths = [os.path.join(directory, filename) for filename in filenames]
+    for filename, file_hash in zip(filenames, hash_files(filepaths)):
+        if file_hash:
+            content_map[file_hash].append(filename)
     return content_map
 
 def compare_folders(dirA, dirB):
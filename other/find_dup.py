@@ -3,11 +3,11 @@ import os
 import hashlib
 from collections import defaultdict
 
-def get_file_hash(file_path, block_size=65536):
+def get_file_hash(file_path, block_size=1024 * 1024):
     """计算文件的MD5哈希值（大文件友好）"""
     hasher = hashlib.md5()
     try:
-        with open(file_path, 'rb') as f:
+        with open(file_path, 'rb', buffering=0) as f:
             while chunk := f.read(block_size):
                 hasher.update(chunk)
         return hasher.hexdigest()
@@ -15,14 +15,26 @@ def get_file_hash(file_path, block_size=65536):
         print(f"无法读取文件 {file_path}: {str(e)}")
         return None
 
+def scan_files(directory, file_map):
+    """
+    递归收集文件路径到 {文件名: [路径列表]}，直接使用scandir返回的文件类型信息
+    不进入指向目录的符号链接；指向文件的符号链接按普通文件收集（与os.walk一致）
+    """
+    subdirs = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                file_map[entry.name].append(entry.path)
+    for subdir in subdirs:
+        scan_files(subdir, file_map)
+
 def find_and_compare_duplicates(start_dir):
     """主函数：查找并比较同名文件"""
     # 1. 递归收集所有文件路径
     file_map = defaultdict(list)
-    for root, _, files in os.walk(start_dir):
-        for filename in files:
-            full_path = os.path.join(root, filename)
-            file_map[filename].append(full_path)
+    scan_files(start_dir, file_map)
 
     # 2. 筛选出同名文件组
     duplicate_groups = {k: v for k, v in file_map.items() if len(v) > 1}
@@ -1,14 +1,18 @@
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
 import os
 import re
 import shutil
-from pathlib import Path
-from datetime import datetime
+import struct
 from PIL import Image, UnidentifiedImageError
-from PIL.ExifTags import TAGS
 import logging
 import sys
 
+# EXIF解析与上级目录的脚本共用
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from exif_utils import DATETIME_ORIGINAL, EXIF_IFD_POINTER, parse_exif_datetime_string, read_jpeg_exif_datetime
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -19,19 +23,62 @@ logging.basicConfig(
     ]
 )
 
-# 标准文件名模式: IMG_YYYYMMDD_HHMMSS.ext
-STANDARD_NAME_PATTERN = re.compile(r'^IMG_\d{8}_\d{6}\.\w+$', re.IGNORECASE)
+# 直接解析EXIF段的JPEG扩展名
+JPEG_EXTENSIONS = {'.jpg', '.jpeg'}
+
+# 支持的图片格式（小写）
+VALID_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.heic', '.gif', '.tiff', '.webp', '.bmp')
+
+# 照片数超过该值时才启用多进程解析EXIF，避免少量照片承担进程启动开销
+PARALLEL_THRESHOLD = 16
+
+# 已按规则命名的文件名（可带冲突序号）: IMG_YYYYMMDD_HHMMSS[_N].ext
+NUMBERED_NAME_PATTERN = re.compile(r'^IMG_(\d{8}_\d{6})(?:_(\d+))?(\.\w+)$', re.IGNORECASE)
 
 def is_standard_filename(filename):
-    """检查文件名是否符合目标格式 IMG_YYYYMMDD_HHMMSS.ext"""
-    return bool(STANDARD_NAME_PATTERN.match(filename))
+    """
+    检查文件名是否符合目标格式 IMG_YYYYMMDD_HHMMSS[_N].ext（IMG前缀不区分大小写）
+    带冲突序号的文件名同样视为已命名，与seed_time_counter的NUMBERED_NAME_PATTERN一致，重复运行时不会再次重命名
+    时间部分是定长的，直接按位置比较字符，比正则匹配快
+    """
+    if len(filename) < 21 or filename[12] != '_':
+        return False
+    if filename[19] == '.':
+        ext_start = 20
+    elif filename[19] == '_':
+        # 冲突序号: _N，序号之后紧跟扩展名
+        dot = filename.find('.', 20)
+        if dot < 0 or not filename[20:dot].isdecimal():
+            return False
+        ext_start = dot + 1
+    else:
+        return False
+    return (filename[:4].upper() == 'IMG_'
+            and filename[4:12].isdecimal()
+            and filename[13:19].isdecimal()
+            and filename[ext_start:].replace('_', 'x').isalnum())
+
+def read_datetime_original(file_path):
+    """
+    读取照片EXIF中的DateTimeOriginal原始字符串
+    JPEG直接解析APP1段，其他格式或解析失败时使用Pillow读取
+    """
+    if os.path.splitext(file_path)[1].lower() in JPEG_EXTENSIONS:
+        try:
+            return read_jpeg_exif_datetime(file_path)
+        except (ValueError, struct.error):
+            pass
+    
+    with Image.open(file_path) as img:
+        # getexif()按需解析，按标签ID直接读取Exif子IFD中的拍摄时间
+        return img.getexif().get_ifd(EXIF_IFD_POINTER).get(DATETIME_ORIGINAL)
 
 def get_shooting_time(file_path):
     """
     获取照片拍摄时间（优先使用EXIF元数据）
     
     参数:
-        file_path (Path): 照片文件路径
+        file_path (str): 照片文件路径
         
     返回:
         datetime对象: 拍摄时间 (成功时)
@@ -39,182 +86,236 @@ def get_shooting_time(file_path):
     """
     try:
         # 尝试从EXIF元数据获取拍摄时间
-        with Image.open(file_path) as img:
-            exif_data = img._getexif()
-            if exif_data:
-                for tag_id, value in exif_data.items():
-                    tag_name = TAGS.get(tag_id, tag_id)
-                    if tag_name == "DateTimeOriginal":
-                        # 转换EXIF时间字符串为datetime对象
-                        return datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
+        value = read_datetime_original(file_path)
+        if value:
+            # 转换EXIF时间字符串为datetime对象
+            return parse_exif_datetime_string(value)
         
         return None
     
     except (UnidentifiedImageError, TypeError, ValueError, OSError) as e:
-        logging.warning(f"无法读取 {file_path.name} 的EXIF: {str(e)}")
+        logging.warning(f"无法读取 {os.path.basename(file_path)} 的EXIF: {str(e)}")
         return None
     except Exception as e:
-        logging.error(f"处理 {file_path.name} 时发生意外错误: {str(e)}")
+        logging.error(f"处理 {os.path.basename(file_path)} 时发生意外错误: {str(e)}")
         return None
 
-def generate_new_filename(file_path, time_counter):
+def read_shooting_times(file_paths, executor=None):
+    """
+    读取多个照片的拍摄时间，照片较多时分发到多个进程并行解析EXIF
+    
+    参数:
+        file_paths (list): 照片文件路径列表
+        executor (Executor): 复用的进程池或线程池，为None时在当前进程中依次读取
+        
+    返回:
+        list: 拍摄时间列表（datetime或None），顺序与输入一致
+    """
+    if executor is None or len(file_paths) <= PARALLEL_THRESHOLD:
+        return [get_shooting_time(file_path) for file_path in file_paths]
+    
+    return list(executor.map(get_shooting_time, file_paths, chunksize=64))
+
+def scan_image_dirs(root, exts):
+    """
+    递归遍历目录，每个文件夹返回一次其中的图片文件（先返回当前文件夹，再进入子文件夹）
+    先按文件名后缀过滤，只对可能是图片的条目判断文件类型；类型信息直接取自scandir结果，无需额外stat
+    读取完一个文件夹的列表后才返回，调用方可以放心重命名其中的文件
+    
+    参数:
+        root (str): 要遍历的目录
+        exts (tuple): 小写扩展名元组（带点，不超过5个字符）
+        
+    返回:
+        generator: (文件夹路径, 按修改时间和名称排序的图片文件名列表, 文件夹中全部条目名称列表)
+    """
+    files = []
+    subdirs = []
+    names = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            names.append(entry.name)
+            # 只把文件名末尾几个字符转为小写，再用endswith一次比较所有扩展名
+            if entry.name[-5:].lower().endswith(exts) and entry.is_file():
+                files.append((entry.stat().st_mtime_ns, entry.name))
+            elif entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+    if files:
+        # 按修改时间排序：连拍等同一秒的照片按拍摄先后获得_1、_2序号，多次运行结果一致
+        files.sort()
+        yield root, [name for _, name in files], names
+    for subdir in subdirs:
+        yield from scan_image_dirs(subdir, exts)
+
+def seed_time_counter(names):
+    """
+    根据文件夹中已有的文件名初始化时间戳计数器
+    每个(时间, 扩展名)从已占用的最大序号之后开始编号，生成的新文件名不会与已有文件冲突，无需逐个检查
+    
+    参数:
+        names (iterable): 文件夹中已有的文件名
+        
+    返回:
+        defaultdict: (时间字符串, 小写扩展名) -> 下一个可用序号（0表示不加序号）
+    """
+    time_counter = defaultdict(int)
+    for name in names:
+        match = NUMBERED_NAME_PATTERN.match(name)
+        if match:
+            time_str, suffix, ext = match.groups()
+            key = (time_str, ext.lower())
+            time_counter[key] = max(time_counter[key], int(suffix or 0) + 1)
+    return time_counter
+
+def generate_new_filename(filename, shoot_time, time_counter):
     """
-    生成新的文件名并处理冲突
+    生成新的文件名并处理冲突（全程使用字符串，不构造Path对象）
     
     参数:
-        file_path (Path): 原始文件路径
-        time_counter (dict): 时间戳使用计数器
+        filename (str): 原始文件名
+        shoot_time (datetime): 拍摄时间，None表示没有拍摄时间
+        time_counter (dict): 时间戳计数器，由seed_time_counter初始化
         
     返回:
-        Path: 新文件路径
+        str: 新文件名
         str: 状态信息
     """
-    # 获取文件信息
-    dir_path = file_path.parent
-    filename = file_path.name
-    file_ext = file_path.suffix.lower()
+    # 获取文件扩展名
+    file_ext = os.path.splitext(filename)[1].lower()
     
     # 检查是否已经是标准文件名
     if is_standard_filename(filename):
-        return file_path, "跳过 (已符合命名规则)"
+        return filename, "跳过 (已符合命名规则)"
     
-    # 获取拍摄时间
-    shoot_time = get_shooting_time(file_path)
+    # 检查拍摄时间
     if not shoot_time:
-        return file_path, "跳过 (无拍摄时间)"
+        return filename, "跳过 (无拍摄时间)"
     
-    # 格式化时间字符串 (YYYYMMDD_HHMMSS)
-    time_str = shoot_time.strftime("%Y%m%d_%H%M%S")
-    base_name = f"IMG_{time_str}{file_ext}"
+    # 格式化时间字符串 (YYYYMMDD_HHMMSS)，直接格式化各字段，不经过strftime
+    time_str = (f"{shoot_time.year:04d}{shoot_time.month:02d}{shoot_time.day:02d}_"
+                f"{shoot_time.hour:02d}{shoot_time.minute:02d}{shoot_time.second:02d}")
     
-    # 处理文件名冲突
-    counter = time_counter[time_str]
+    # 处理文件名冲突：计数器已越过文件夹中所有已占用的序号
+    key = (time_str, file_ext)
+    counter = time_counter[key]
     if counter > 0:
         new_name = f"IMG_{time_str}_{counter}{file_ext}"
     else:
-        new_name = base_name
+        new_name = f"IMG_{time_str}{file_ext}"
     
     # 更新计数器
-    time_counter[time_str] += 1
-    
-    # 构造新路径
-    new_path = dir_path / new_name
-    
-    # 避免覆盖已存在文件
-    conflict_count = 0
-    while new_path.exists():
-        conflict_count += 1
-        new_name = f"IMG_{time_str}_{counter}_{conflict_count}{file_ext}"
-        new_path = dir_path / new_name
+    time_counter[key] += 1
     
     # 检查是否有必要重命名（新名称与旧名称相同）
-    if new_path == file_path:
-        return file_path, "跳过 (名称无变化)"
+    if new_name == filename:
+        return filename, "跳过 (名称无变化)"
     
-    return new_path, "成功"
+    return new_name, "成功"
 
-def batch_rename_photos(root_dir):
+def batch_rename_photos(root_dir, io_threads=0):
     """
     批量重命名照片文件
+    逐个文件夹读取拍摄时间并重命名，内存占用只与单个文件夹中的照片数有关
     
     参数:
         root_dir (str): 根目录路径
+        io_threads (int): 大于0时用该数量的线程读取EXIF，否则每个CPU一个进程；
+            机械硬盘或网络共享上读取EXIF主要在等待I/O，少量线程即可重叠等待时间，也比多进程省内存
         
     返回:
-        list: 重命名结果报告
+        generator: 每个文件的重命名结果
     """
-    # 支持的图片格式
-    valid_exts = ('.jpg', '.jpeg', '.png', '.heic', '.gif', '.tiff', '.webp', '.bmp')
-    
-    # 第一阶段：收集所有图片文件
-    all_images = []
-    root_path = Path(root_dir).resolve()
-    
+    root_path = os.path.realpath(root_dir)
     logging.info("开始扫描文件夹...")
-    for foldername, _, filenames in os.walk(root_path):
-        folder_path = Path(foldername)
-        for filename in filenames:
-            file_path = folder_path / filename
-            if file_path.suffix.lower() in valid_exts:
-                all_images.append(file_path)
     
-    total_count = len(all_images)
-    if total_count == 0:
-        return []
-    
-    logging.info(f"找到 {total_count} 张照片文件")
-    
-    # 第二阶段：按文件夹分组处理文件
-    folder_groups = defaultdict(list)
-    for file_path in all_images:
-        folder_groups[file_path.parent].append(file_path)
-    
-    # 第三阶段：处理文件重命名
-    results = []
+    total_count = 0
     processed_count = 0
-    
-    for folder_path, file_list in folder_groups.items():
-        # 初始化时间戳计数器（每个文件夹独立计数）
-        time_counter = defaultdict(int)
-        
-        for file_path in file_list:
-            # 生成新文件名
-            new_path, status = generate_new_filename(file_path, time_counter)
+    # 执行器在整个运行中复用，工作进程/线程在第一次提交任务时才会启动
+    if io_threads > 0:
+        executor = ThreadPoolExecutor(max_workers=io_threads)
+    else:
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+    with executor:
+        for folder_path, file_list, entry_names in scan_image_dirs(root_path, VALID_EXTENSIONS):
+            total_count += len(file_list)
+            
+            # 并行读取拍摄时间（已是标准文件名的照片无需读取）
+            exif_names = [name for name in file_list if not is_standard_filename(name)]
+            exif_paths = [os.path.join(folder_path, name) for name in exif_names]
+            shoot_times = dict(zip(exif_names, read_shooting_times(exif_paths, executor)))
             
-            # 跳过不需要重命名的文件
-            if file_path == new_path:
-                results.append({
-                    "original": file_path.name,
-                    "new": file_path.name,
-                    "path": str(file_path.parent),
-                    "status": status
-                })
-                continue
+            # 初始化时间戳计数器（每个文件夹独立计数，跳过已占用的序号；直接使用扫描时读到的条目名称）
+            time_counter = seed_time_counter(entry_names)
             
-            # 执行重命名
-            try:
-                file_path.rename(new_path)
-                results.append({
-                    "original": file_path.name,
-                    "new": new_path.name,
-                    "path": str(file_path.parent),
-                    "status": status
-                })
-                processed_count += 1
-                logging.info(f"重命名: {file_path.name} → {new_path.name}")
-            except Exception as e:
-                error_msg = f"重命名失败: {str(e)}"
-                results.append({
-                    "original": file_path.name,
-                    "new": file_path.name,
-                    "path": str(file_path.parent),
-                    "status": error_msg
-                })
-                logging.error(error_msg)
+            # 在主进程中依次重命名
+            for filename in file_list:
+                # 生成新文件名
+                shoot_time = shoot_times.get(filename)
+                new_name, status = generate_new_filename(filename, shoot_time, time_counter)
+                
+                # 跳过不需要重命名的文件
+                if new_name == filename:
+                    yield {
+                        "original": filename,
+                        "new": filename,
+                        "path": folder_path,
+                        "status": status
+                    }
+                    continue
+                
+                # 执行重命名
+                try:
+                    os.rename(os.path.join(folder_path, filename), os.path.join(folder_path, new_name))
+                    processed_count += 1
+                    logging.info(f"重命名: {filename} → {new_name}")
+                    yield {
+                        "original": filename,
+                        "new": new_name,
+                        "path": folder_path,
+                        "status": status
+                    }
+                except Exception as e:
+                    error_msg = f"重命名失败: {str(e)}"
+                    logging.error(error_msg)
+                    yield {
+                        "original": filename,
+                        "new": filename,
+                        "path": folder_path,
+                        "status": error_msg
+                    }
     
-    logging.info(f"处理完成! 共处理 {len(results)} 个文件，其中 {processed_count} 个文件被重命名")
-    return results
+    logging.info(f"处理完成! 共处理 {total_count} 个文件，其中 {processed_count} 个文件被重命名")
 
 def print_summary_report(results):
-    """打印整理报告"""
-    if not results:
-        print("\n🔍 未找到符合条件的照片文件")
-        return
-    
-    print("\n📊 照片重命名结果报告:")
-    print("=" * 70)
-    print(f"{'原文件名':<30} {'新文件名':<30} {'状态'}")
-    print("-" * 70)
+    """
+    打印整理报告
+    结果只遍历一次，可以直接传入batch_rename_photos返回的生成器，边处理边输出
     
+    返回:
+        dict: 第一个重命名成功的结果，没有时返回None
+    """
+    total_count = 0
     success_count = 0
     skip_count = 0
     error_count = 0
+    first_path = None
+    sample = None
     
     for item in results:
+        if total_count == 0:
+            first_path = item["path"]
+            print("\n📊 照片重命名结果报告:")
+            print("=" * 70)
+            print(f"{'原文件名':<30} {'新文件名':<30} {'状态'}")
+            print("-" * 70)
+        total_count += 1
+        
         # 状态分类统计
         if "成功" in item["status"]:
             status_icon = "✅"
             success_count += 1
+            if sample is None:
+                sample = item
         elif "跳过" in item["status"]:
             status_icon = "↷"
             skip_count += 1
@@ -224,14 +325,17 @@ def print_summary_report(results):
         
         print(f"{item['original'][:28]:<30} {item['new'][:28]:<30} {status_icon} {item['status']}")
     
+    if total_count == 0:
+        print("\n🔍 未找到符合条件的照片文件")
+        return None
+    
     print("=" * 70)
-    print(f"总计: {len(results)} 个文件")
+    print(f"总计: {total_count} 个文件")
     print(f"✅ 成功重命名: {success_count}")
     print(f"↷ 跳过: {skip_count} (符合规则、无变化或无拍摄时间)")
     print(f"❌ 失败: {error_count}")
-    
-    if results:
-        print(f"处理路径: {os.path.abspath(results[0]['path'])}")
+    print(f"处理路径: {os.path.abspath(first_path)}")
+    return sample
 
 if __name__ == "__main__":
     print("📷 照片批量重命名工具")
@@ -239,6 +343,11 @@ if __name__ == "__main__":
     print("命名规则: IMG_日期_时间.后缀名 (如 IMG_20131221_214348.jpg)")
     print("=" * 50)
     
+    parser = argparse.ArgumentParser(description='照片批量重命名工具')
+    parser.add_argument('--io-threads', type=int, default=0,
+                        help='用指定数量的线程读取EXIF（机械硬盘、网络共享建议4-8），默认每个CPU一个进程')
+    args = parser.parse_args()
+    
     # 获取目标路径
     target_dir = input("请输入照片目录路径: ").strip()
     
@@ -246,20 +355,12 @@ if __name__ == "__main__":
         print(f"\n❌ 错误: 目录不存在 - {target_dir}")
         sys.exit(1)
     
-    # 执行批量重命名
+    # 执行批量重命名，处理结果边生成边输出
     print("\n⏳ 正在扫描并处理照片，请稍候...")
-    rename_results = batch_rename_photos(target_dir)
-    
-    # 显示结果
-    print("\n" + "=" * 50)
-    print("✨ 处理完成! 结果摘要")
-    print("=" * 50)
-    print_summary_report(rename_results)
+    sample = print_summary_report(batch_rename_photos(target_dir, io_threads=args.io_threads))
     
     # 显示示例
-    if rename_results:
-        sample = next((r for r in rename_results if "成功" in r["status"]), None)
-        if sample:
-            print(f"\n示例: {sample['original']} → {sample['new']}")
+    if sample:
+        print(f"\n示例: {sample['original']} → {sample['new']}")
 
 # /Users/zhengjunming/Documents/mj_picture/DCIM/image/camera_01/20170819_IMG_2092.JPG
@@ -3,6 +3,10 @@ from PIL.ExifTags import TAGS
 import os
 import sys
 
+# EXIF标签ID: Exif子IFD指针、DateTimeOriginal（拍摄时间）
+EXIF_IFD_POINTER = 0x8769
+DATETIME_ORIGINAL = 0x9003
+
 def get_image_shooting_time(image_path):
     """
     获取照片的拍摄时间（从EXIF元数据中提取）
@@ -16,18 +20,16 @@ def get_image_shooting_time(image_path):
     try:
         # 打开图像文件
         with Image.open(image_path) as img:
-            # 获取EXIF数据
-            exif_data = img._getexif()
+            # 获取EXIF数据（getexif()按需解析，不会解码全部IFD）
+            exif_data = img.getexif()
             
-            if exif_data is None:
+            if not exif_data:
                 return "错误: 照片不包含EXIF数据"
             
-            # 查找拍摄时间标签
-            for tag_id, value in exif_data.items():
-                tag_name = TAGS.get(tag_id, tag_id)
-                # 检查拍摄时间标签（DateTimeOriginal）
-                if tag_name == "DateTimeOriginal":
-                    return value
+            # 按标签ID直接从Exif子IFD查找拍摄时间（DateTimeOriginal）
+            value = exif_data.get_ifd(EXIF_IFD_POINTER).get(DATETIME_ORIGINAL)
+            if value:
+                return value
             
             return "错误: 照片EXIF中未找到拍摄时间信息"
     
@@ -0,0 +1,16 @@
+import struct
+
+
+def make_jpeg(dt=None):
+    """构造最小JPEG文件内容，dt不为None时带只包含DateTimeOriginal的EXIF段（小端TIFF）"""
+    out = b'\xff\xd8'
+    if dt is not None:
+        tiff = b'II' + struct.pack('<HI', 42, 8)
+        # IFD0: 只有一个指向Exif子IFD的条目
+        tiff += struct.pack('<H', 1) + struct.pack('<HHII', 0x8769, 4, 1, 26) + struct.pack('<I', 0)
+        # Exif子IFD: DateTimeOriginal，字符串紧跟在IFD之后
+        tiff += struct.pack('<H', 1) + struct.pack('<HHII', 0x9003, 2, 20, 44) + struct.pack('<I', 0)
+        tiff += dt + b'\x00'
+        app1 = b'Exif\x00\x00' + tiff
+        out += b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1
+    return out + b'\xff\xda\x00\x02' + b'\x00' * 16 + b'\xff\xd9'
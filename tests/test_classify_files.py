@@ -3,6 +3,9 @@ import sys
 import unittest
 import shutil
 import tempfile
+import errno
+import io
+from unittest import mock
 
 # 添加父目录到sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -85,5 +88,39 @@ class TestClassifyFiles(unittest.TestCase):
         self.assertTrue(os.path.exists(os.path.join(self.test_dir, ".hidden_file")))
         self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'image', "a" * 200 + ".png")))
 
+    def test_cross_device_move(self):
+        """测试跨文件系统移动时回退到shutil.move"""
+        self.create_test_file("photo.jpg")
+        
+        exdev = OSError(errno.EXDEV, "Invalid cross-device link")
+        with mock.patch("classify_files.os.rename", side_effect=exdev), \
+             mock.patch("classify_files.shutil.move") as move:
+            classify_files.classify_files(self.test_dir)
+        
+        move.assert_called_once_with(
+            os.path.join(self.test_dir, "photo.jpg"),
+            os.path.join(self.test_dir, "image", "photo.jpg"))
+
+    def test_move_failure_reported_per_file(self):
+        """单个文件移动失败时报告该文件，其他文件照常移动并输出结果"""
+        self.create_test_file("bad.jpg")
+        self.create_test_file("good.mp4")
+        
+        real_rename = os.rename
+        def rename(src, dest):
+            if src.endswith("bad.jpg"):
+                raise PermissionError(errno.EACCES, "Permission denied")
+            real_rename(src, dest)
+        
+        with mock.patch("classify_files.os.rename", side_effect=rename), \
+             mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            classify_files.classify_files(self.test_dir)
+        
+        output = stdout.getvalue()
+        self.assertIn("移动失败: bad.jpg", output)
+        self.assertIn("移动视频: good.mp4 -> video/", output)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "bad.jpg")))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "video", "good.mp4")))
+
 if __name__ == "__main__":
     unittest.main()
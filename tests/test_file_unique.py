@@ -5,6 +5,7 @@ import unittest
 import shutil
 import hashlib
 import io
+import tempfile
 
 # 添加父目录到sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -18,13 +19,11 @@ class TestFileUnique(unittest.TestCase):
         print(f"\n=== 开始测试: {self._testMethodName} ===")
         
         # 创建临时测试目录
-        self.test_dir = "test_dir"
-        os.makedirs(self.test_dir, exist_ok=True)
+        self.test_dir = tempfile.mkdtemp()
     
     def tearDown(self):
         # 清理测试目录
-        if os.path.exists(self.test_dir):
-            shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
     
     def create_test_file(self, filename, content=None):
         """创建测试文件"""
@@ -37,7 +36,7 @@ class TestFileUnique(unittest.TestCase):
     def test_empty_directory(self, mock_stdout):
         """测试空目录"""
         with patch("argparse.ArgumentParser.parse_args") as mock_args:
-            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False)
+            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False, max_concurrency=None, cache=False)
             file_unique.main()
         output = mock_stdout.getvalue()
         self.assertIn("✅ 未发现重复文件", output)
@@ -49,7 +48,7 @@ class TestFileUnique(unittest.TestCase):
         self.create_test_file("file2.txt")
         
         with patch("argparse.ArgumentParser.parse_args") as mock_args:
-            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False)
+            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False, max_concurrency=None, cache=False)
             file_unique.main()
         output = mock_stdout.getvalue()
         self.assertIn("✅ 未发现重复文件", output)
@@ -63,7 +62,7 @@ class TestFileUnique(unittest.TestCase):
         file3 = self.create_test_file("file3.txt", content)
         
         with patch("argparse.ArgumentParser.parse_args") as mock_args:
-            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False)
+            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False, max_concurrency=None, cache=False)
             file_unique.main()
         
         # 验证只保留了第一个文件
@@ -79,7 +78,7 @@ class TestFileUnique(unittest.TestCase):
         file2 = self.create_test_file("file2.txt", content)
         
         with patch("argparse.ArgumentParser.parse_args") as mock_args:
-            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=True)
+            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=True, max_concurrency=None, cache=False)
             file_unique.main()
         output = mock_stdout.getvalue()
         
@@ -88,6 +87,109 @@ class TestFileUnique(unittest.TestCase):
         self.assertTrue(os.path.exists(file2))
         self.assertIn("[SIMULATE]", output)
     
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_many_files_parallel(self, mock_stdout):
+        """测试文件较多时多进程计算哈希"""
+        files = []
+        for i in range(file_unique.PARALLEL_THRESHOLD * 2):
+            files.append(self.create_test_file(f"file{i:02d}.txt", f"content {i % 4}"))
+        
+        with patch("argparse.ArgumentParser.parse_args") as mock_args:
+            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False, max_concurrency=None, cache=False)
+            file_unique.main()
+        
+        # 每种内容只保留排序后的第一个文件
+        self.assertEqual(sorted(os.listdir(self.test_dir)), [os.path.basename(f) for f in files[:4]])
+    
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_max_concurrency_one(self, mock_stdout):
+        """测试限制为单个进程时不启动进程池"""
+        files = []
+        for i in range(file_unique.PARALLEL_THRESHOLD * 2):
+            files.append(self.create_test_file(f"file{i:02d}.txt", f"content {i % 4}"))
+        
+        with patch("argparse.ArgumentParser.parse_args") as mock_args, \
+             patch("file_unique.ProcessPoolExecutor") as mock_pool:
+            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False, max_concurrency=1, cache=False)
+            file_unique.main()
+        
+        mock_pool.assert_not_called()
+        self.assertEqual(sorted(os.listdir(self.test_dir)), [os.path.basename(f) for f in files[:4]])
+    
+    def test_unique_sizes_not_hashed(self):
+        """测试大小唯一的文件不计算哈希"""
+        self.create_test_file("small.txt", "a")
+        self.create_test_file("large.txt", "abc")
+        same1 = self.create_test_file("same1.txt", "xy")
+        same2 = self.create_test_file("same2.txt", "zw")
+        same3 = self.create_test_file("same3.txt", "uv")
+        
+        with patch("file_unique.calculate_digest", side_effect=lambda p: "digest-" + p) as mock_digest:
+            duplicates = file_unique.find_duplicate_files(self.test_dir)
+        
+        hashed = sorted(call.args[0] for call in mock_digest.call_args_list)
+        self.assertEqual(hashed, sorted([same1, same2, same3]))
+        self.assertEqual(duplicates, [])
+    
+    def test_digest_cache_reused(self):
+        """测试重复运行时未变化的文件直接使用缓存的哈希值"""
+        file1 = self.create_test_file("file1.txt", "same")
+        file2 = self.create_test_file("file2.txt", "same")
+        cache = file_unique.MetadataCache(os.path.join(self.test_dir, "cache", "cache.sqlite"))
+        try:
+            first = file_unique.find_duplicate_files(self.test_dir, cache=cache)
+            with patch("file_unique.calculate_digest") as mock_digest:
+                second = file_unique.find_duplicate_files(self.test_dir, cache=cache)
+        finally:
+            cache.close()
+        
+        mock_digest.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(sorted(second[0]), sorted([file1, file2]))
+    
+    def test_different_heads_not_hashed(self):
+        """测试大小相同但头部不同的大文件不计算完整哈希"""
+        size = file_unique.HEAD_SIZE * 2
+        self.create_test_file("head_a.bin", "a" + "x" * (size - 1))
+        self.create_test_file("head_b.bin", "b" + "x" * (size - 1))
+        tail_a = self.create_test_file("tail_a.bin", "y" * (size - 1) + "a")
+        tail_b = self.create_test_file("tail_b.bin", "y" * (size - 1) + "b")
+        tail_c = self.create_test_file("tail_c.bin", "y" * (size - 1) + "c")
+        
+        with patch("file_unique.calculate_digest", side_effect=lambda p: "digest-" + p) as mock_digest:
+            duplicates = file_unique.find_duplicate_files(self.test_dir)
+        
+        # 头部相同、尾部不同的文件仍需完整哈希
+        hashed = sorted(call.args[0] for call in mock_digest.call_args_list)
+        self.assertEqual(hashed, sorted([tail_a, tail_b, tail_c]))
+        self.assertEqual(duplicates, [])
+
+    def test_heads_hashed_without_process_pool(self):
+        """测试头部哈希不使用进程池，头部都不同时不启动进程池"""
+        size = file_unique.HEAD_SIZE * 2
+        for i in range(file_unique.PARALLEL_THRESHOLD * 2):
+            self.create_test_file(f"file{i:02d}.bin", f"{i:02d}" + "x" * (size - 2))
+
+        with patch("file_unique.ProcessPoolExecutor") as mock_pool:
+            duplicates = file_unique.find_duplicate_files(self.test_dir)
+
+        mock_pool.assert_not_called()
+        self.assertEqual(duplicates, [])
+
+    def test_pair_compared_without_hashing(self):
+        """测试只有两个候选文件时逐字节比较，不计算哈希"""
+        file1 = self.create_test_file("file1.txt", "same")
+        file2 = self.create_test_file("file2.txt", "same")
+        self.create_test_file("diff1.txt", "abcdef")
+        self.create_test_file("diff2.txt", "abcdeg")
+        
+        with patch("file_unique.calculate_digest") as mock_digest:
+            duplicates = file_unique.find_duplicate_files(self.test_dir)
+        
+        mock_digest.assert_not_called()
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(sorted(duplicates[0]), sorted([file1, file2]))
+    
     # @patch('sys.stdout', new_callable=io.StringIO)
     # def test_unreadable_file(self, mock_stdout):
     #     """测试无法读取的文件"""
@@ -98,7 +200,7 @@ class TestFileUnique(unittest.TestCase):
     #     os.chmod(file2, 0o000)
         
     #     with patch("argparse.ArgumentParser.parse_args") as mock_args:
-    #         mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False)
+    #         mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False, max_concurrency=None, cache=False)
     #         file_unique.main()
     #     output = mock_stdout.getvalue()
         
@@ -114,12 +216,30 @@ class TestFileUnique(unittest.TestCase):
         file2 = self.create_test_file("large2.bin", large_content.hex())
         
         with patch("argparse.ArgumentParser.parse_args") as mock_args:
-            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False)
+            mock_args.return_value = MagicMock(directory=self.test_dir, simulate=False, max_concurrency=None, cache=False)
             file_unique.main()
         
         # 验证重复文件被正确处理
         self.assertTrue(os.path.exists(file1))
         self.assertFalse(os.path.exists(file2))
 
+    @unittest.skipUnless(hasattr(os, "symlink"), "需要符号链接支持")
+    def test_symlink_not_duplicate(self):
+        """指向目录中文件的符号链接不视为重复文件"""
+        target = self.create_test_file("b_target.txt", "same content")
+        os.symlink(target, os.path.join(self.test_dir, "a_link.txt"))
+
+        duplicates = file_unique.find_duplicate_files(self.test_dir)
+        self.assertEqual(duplicates, [])
+
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_max_concurrency_rejects_non_positive(self, mock_stderr):
+        """--max-concurrency 为0或负数时在解析参数阶段报错"""
+        for value in ("0", "-2"):
+            with patch("sys.argv", ["file_unique.py", self.test_dir, "--max-concurrency", value]):
+                with self.assertRaises(SystemExit):
+                    file_unique.main()
+        self.assertEqual(file_unique.positive_int("3"), 3)
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,6 @@
 import os
 import shutil
+import tempfile
 import unittest
 
 import io
@@ -13,15 +14,16 @@ import merge_all
 class TestMergeAll(unittest.TestCase):
     def setUp(self):
         """创建临时源文件夹和目标文件夹"""
-        self.source_dir = "test_source"
-        self.target_dir = "test_target"
-        os.makedirs(self.source_dir, exist_ok=True)
-        os.makedirs(self.target_dir, exist_ok=True)
+        # 放在系统临时目录下（可通过 TMPDIR 指向 tmpfs），不在工作目录中留下文件
+        self.base_dir = tempfile.mkdtemp()
+        self.source_dir = os.path.join(self.base_dir, "source")
+        self.target_dir = os.path.join(self.base_dir, "target")
+        os.mkdir(self.source_dir)
+        os.mkdir(self.target_dir)
     
     def tearDown(self):
         """清理临时文件夹"""
-        shutil.rmtree(self.source_dir, ignore_errors=True)
-        shutil.rmtree(self.target_dir, ignore_errors=True)
+        shutil.rmtree(self.base_dir, ignore_errors=True)
     
     # 测试 1: 基础功能 - 无冲突复制
     def test_basic_copy(self):
@@ -145,5 +147,30 @@ class TestMergeAll(unittest.TestCase):
             expected = f"massive_{i}.txt" if i > 0 else "massive.txt"
             self.assertIn(expected, files)
 
+    # 测试 9: 目标文件夹位于源文件夹内
+    def test_target_inside_source(self):
+        inner_target = os.path.join(self.source_dir, "merged")
+        os.makedirs(inner_target)
+        with open(os.path.join(self.source_dir, "a.txt"), "w") as f:
+            f.write("A")
+        with open(os.path.join(inner_target, "old.txt"), "w") as f:
+            f.write("Old")
+        
+        merge_all.copy_files_with_conflict_resolution(self.source_dir, inner_target)
+        
+        # 目标目录中已有的文件不会被再次复制
+        self.assertEqual(sorted(os.listdir(inner_target)), ["a.txt", "old.txt"])
+
+    # 测试 10: 文件名冲突按大小写不敏感处理
+    def test_case_insensitive_conflict(self):
+        with open(os.path.join(self.target_dir, "IMG.JPG"), "w") as f:
+            f.write("Old")
+        with open(os.path.join(self.source_dir, "img.jpg"), "w") as f:
+            f.write("New")
+        
+        merge_all.copy_files_with_conflict_resolution(self.source_dir, self.target_dir)
+        
+        self.assertEqual(sorted(os.listdir(self.target_dir)), ["IMG.JPG", "img_1.jpg"])
+
 if __name__ == "__main__":
     unittest.main()
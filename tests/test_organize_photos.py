@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+import shutil
+import tempfile
+
+# 添加测试目录（共用的测试数据构造函数）和父目录到sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jpeg_fixtures import make_jpeg
+
+try:
+    import organize_photos
+except ImportError:
+    # organize_photos依赖Pillow
+    organize_photos = None
+
+
+@unittest.skipIf(organize_photos is None, "需要安装Pillow")
+class TestClassifyPhotos(unittest.TestCase):
+    def setUp(self):
+        print(f"\n=== 开始测试: {self._testMethodName} ===")
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def create_photo(self, filename, dt=None):
+        with open(os.path.join(self.test_dir, filename), "wb") as f:
+            f.write(make_jpeg(dt))
+
+    def listdir(self, *parts):
+        return sorted(os.listdir(os.path.join(self.test_dir, *parts)))
+
+    def test_standard_name_without_exif_goes_to_photo(self):
+        """已是标准文件名但没有拍摄时间的照片放入photo目录，不按文件名建立年份目录"""
+        self.create_photo("IMG_20190101_000000.jpg")
+        self.create_photo("IMG_00000000_000000.jpg")
+
+        organize_photos.classify_and_rename_photos(self.test_dir)
+
+        self.assertEqual(self.listdir("photo"), ["IMG_00000000_000000.jpg", "IMG_20190101_000000.jpg"])
+        self.assertEqual(self.listdir("camera"), [])
+
+    def test_standard_name_keeps_name_in_exif_year(self):
+        """已是标准文件名的照片不重命名，年份目录取自EXIF拍摄时间"""
+        self.create_photo("IMG_20190101_000000_1.jpg", b'2013:12:21 21:43:48')
+        self.create_photo("a.jpg", b'2013:12:21 21:43:48')
+
+        organize_photos.classify_and_rename_photos(self.test_dir)
+
+        self.assertEqual(self.listdir("camera"), ["2013"])
+        self.assertEqual(self.listdir("camera", "2013"), ["IMG_20131221_214348.jpg", "IMG_20190101_000000_1.jpg"])
+
+
+@unittest.skipIf(organize_photos is None, "需要安装Pillow")
+class TestCopyFiles(unittest.TestCase):
+    def setUp(self):
+        print(f"\n=== 开始测试: {self._testMethodName} ===")
+        self.test_dir = tempfile.mkdtemp()
+        self.source_dir = os.path.join(self.test_dir, "source")
+        self.target_dir = os.path.join(self.test_dir, "target")
+        os.makedirs(os.path.join(self.source_dir, "sub"))
+        os.makedirs(self.target_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def create_file(self, directory, filename, content):
+        with open(os.path.join(directory, filename), "w") as f:
+            f.write(content)
+
+    def test_skip_duplicates_leaves_no_duplicate(self):
+        """跳过重复文件时，目标目录中不会留下内容重复的文件"""
+        self.create_file(self.target_dir, "old.txt", "AAAA")
+        self.create_file(self.source_dir, "a.txt", "AAAA")
+        self.create_file(self.source_dir, "b.txt", "BBBB")
+        self.create_file(os.path.join(self.source_dir, "sub"), "b.txt", "BBBB")
+        self.create_file(self.source_dir, "c.txt", "CC")
+
+        organize_photos.copy_files_with_conflict_resolution(self.source_dir, self.target_dir,
+                                                            skip_duplicates=True)
+
+        names = sorted(os.listdir(self.target_dir))
+        self.assertEqual(names, ["b.txt", "c.txt", "old.txt"])
+        contents = []
+        for name in names:
+            with open(os.path.join(self.target_dir, name)) as f:
+                contents.append(f.read())
+        self.assertEqual(len(contents), len(set(contents)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+import shutil
+import tempfile
+
+# 添加测试目录（共用的测试数据构造函数）和other目录到sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'other')))
+
+from jpeg_fixtures import make_jpeg
+
+try:
+    import rename_picture
+except ImportError:
+    # rename_picture依赖Pillow
+    rename_picture = None
+
+
+@unittest.skipIf(rename_picture is None, "需要安装Pillow")
+class TestRenamePicture(unittest.TestCase):
+    def setUp(self):
+        print(f"\n=== 开始测试: {self._testMethodName} ===")
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def create_photo(self, filename, mtime, dt=b'2013:12:21 21:43:48'):
+        """创建带拍摄时间的照片，并设置修改时间"""
+        filepath = os.path.join(self.test_dir, filename)
+        with open(filepath, "wb") as f:
+            f.write(make_jpeg(dt))
+        os.utime(filepath, (mtime, mtime))
+        return filepath
+
+    def rename(self):
+        return list(rename_picture.batch_rename_photos(self.test_dir, io_threads=1))
+
+    def test_second_run_renames_nothing(self):
+        """同一秒的多张照片重命名后，再次运行不会改动任何文件"""
+        for i, name in enumerate(["a.jpg", "b.jpg", "c.jpg"]):
+            self.create_photo(name, 1000000000 + i)
+
+        self.rename()
+        expected = ["IMG_20131221_214348.jpg", "IMG_20131221_214348_1.jpg", "IMG_20131221_214348_2.jpg"]
+        self.assertEqual(sorted(os.listdir(self.test_dir)), expected)
+
+        results = self.rename()
+        self.assertTrue(all(item["new"] == item["original"] for item in results))
+        self.assertEqual(sorted(os.listdir(self.test_dir)), expected)
+
+    def test_burst_suffixes_follow_mtime(self):
+        """同一秒的照片按修改时间先后编号，与文件名顺序无关，重复运行结果不变"""
+        self.create_photo("z.jpg", 1000000000)
+        self.create_photo("a.jpg", 1000000001)
+
+        renamed = {item["original"]: item["new"] for item in self.rename()}
+        self.assertEqual(renamed, {"z.jpg": "IMG_20131221_214348.jpg", "a.jpg": "IMG_20131221_214348_1.jpg"})
+
+        self.rename()
+        self.assertEqual(sorted(os.listdir(self.test_dir)),
+                         ["IMG_20131221_214348.jpg", "IMG_20131221_214348_1.jpg"])
+
+    def test_suffix_continues_after_existing(self):
+        """已有带序号的文件时，新照片从最大序号之后编号"""
+        self.create_photo("IMG_20131221_214348_1.jpg", 1000000000)
+        self.create_photo("new.jpg", 1000000001)
+
+        self.rename()
+        self.assertEqual(sorted(os.listdir(self.test_dir)),
+                         ["IMG_20131221_214348_1.jpg", "IMG_20131221_214348_2.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()